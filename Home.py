@@ -3,13 +3,19 @@ import base64
 import streamlit as st
 from yaml import SafeLoader
 import streamlit_authenticator as stauth
-from helper import db_queries
+from helper import db_queries, gallery_cache, model_cache
 
 from helper.db_queries import create_db
+from db_connection import unit_of_work
+from helper.streamlit_helpers import paginate, show_case_image
 
-# ---------------- CREATE TABLES ---------------- #
+# ---------------- SCHEMA CHECK ---------------- #
 create_db()
 
+# ---------------- FACE MODEL / GALLERY WARM-UP ---------------- #
+model_cache.start_warm_up()
+gallery_cache.start_warm_up()
+
 # ---------------- UI HELPERS ---------------- #
 
 def add_bg_from_local(image_file):
@@ -100,20 +106,24 @@ if auth_status is True:
 
     # ---------------- METRICS ---------------- #
 
-    found_cases = db_queries.get_registered_cases_count(name, "F")
-    non_found_cases = db_queries.get_registered_cases_count(name, "NF")
+    # one session (one pool checkout) for every query of this render
+    with unit_of_work():
+        case_counts = db_queries.get_case_counts(name)
 
-    found_col, not_found_col = st.columns(2)
-    found_col.metric("Found Cases Count", value=len(found_cases))
-    not_found_col.metric("Not Found Cases Count", value=len(non_found_cases))
+        found_col, not_found_col = st.columns(2)
+        found_col.metric("Found Cases Count", value=case_counts["F"])
+        not_found_col.metric("Not Found Cases Count", value=case_counts["NF"])
 
-    st.write("---")
+        st.write("---")
 
-    # ---------------- DISPLAY ALL CASES ---------------- #
+        # ---------------- DISPLAY ALL CASES ---------------- #
 
-    st.title("All Registered Cases")
+        st.title("All Registered Cases")
 
-    cases = db_queries.get_all_cases()
+        cases = paginate(
+            "home_cases_page",
+            lambda cursor: db_queries.list_registered_cases(after=cursor),
+        )
 
     if cases:
         for case in cases:
@@ -121,10 +131,7 @@ if auth_status is True:
             col1, col2 = st.columns([1, 2])
 
             with col1:
-                if case.image_path and case.image_path.startswith("http"):
-                    st.image(case.image_path, width=150)
-                else:
-                    st.warning("Image not available")
+                show_case_image(case, width=150)
 
             with col2:
                 st.write(f"**Name:** {case.name}")
@@ -0,0 +1,119 @@
+"""
+Per-image latency and peak RSS of each face model profile.
+
+    python bench_face_profiles.py path/to/images --repeat 3
+
+Every profile runs in a fresh process, so model load time and RSS are
+measured in isolation. Use the same photos the apps receive (full-size
+phone pictures) for representative numbers, and copy the printed rows
+into the profile table in helper/model_cache.py.
+
+Peak RSS comes from `resource` on Unix and from psutil (if installed)
+elsewhere; without either it is left out.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import platform
+import time
+
+import cv2
+import numpy as np
+
+from helper import face_batch, model_cache
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB, or None when it
+    can't be measured on this platform.
+    """
+    try:
+        import resource   # Unix only
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # KiB on Linux, bytes on macOS
+        return max_rss / (1024 * 1024 if platform.system() == "Darwin" else 1024)
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+
+    memory = psutil.Process().memory_info()
+    # peak_wset is the Windows peak working set
+    return getattr(memory, "peak_wset", memory.rss) / (1024 * 1024)
+
+
+def bench_profile(profile, paths, repeat):
+    started = time.perf_counter()
+    app = model_cache.load_face_app(profile)
+    load_seconds = time.perf_counter() - started
+
+    images = [cv2.imread(path) for path in paths]
+    images = [image for image in images if image is not None]
+    if not images:
+        raise ValueError("None of the images could be read")
+
+    # first call allocates ONNX Runtime buffers; keep it out of the stats
+    face_batch.faces_from_image(app, images[0], profile)
+
+    latencies, faces_found = [], 0
+    for _ in range(repeat):
+        for image in images:
+            started = time.perf_counter()
+            faces = face_batch.faces_from_image(app, image, profile)
+            latencies.append(time.perf_counter() - started)
+            faces_found += bool(faces)
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "profile": profile,
+        "load_s": load_seconds,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p95_ms": float(np.percentile(latencies_ms, 95)),
+        "mean_ms": float(latencies_ms.mean()),
+        "peak_rss_mb": peak_rss_mb(),
+        "hit_rate": faces_found / len(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("image_dir")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--profiles", nargs="+", default=["quality", "fast"],
+                        choices=sorted(model_cache.MODEL_PROFILES))
+    args = parser.parse_args()
+
+    paths = sorted(
+        path
+        for pattern in IMAGE_PATTERNS
+        for path in glob.glob(os.path.join(args.image_dir, pattern))
+    )
+    if not paths:
+        raise SystemExit(f"No images found in {args.image_dir}")
+
+    cpu = platform.processor() or platform.machine()
+    print(f"{len(paths)} images x {args.repeat} runs on {cpu}\n")
+    print(f"{'profile':<10}{'load s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'mean ms':>9}{'RSS MB':>9}{'faces':>8}")
+
+    ctx = multiprocessing.get_context("spawn")
+    for profile in args.profiles:
+        with ctx.Pool(1) as pool:
+            r = pool.apply(bench_profile, (profile, paths, args.repeat))
+        rss = "-" if r["peak_rss_mb"] is None else f"{r['peak_rss_mb']:.0f}"
+        print(f"{r['profile']:<10}{r['load_s']:>8.2f}{r['p50_ms']:>9.1f}"
+              f"{r['p95_ms']:>9.1f}{r['mean_ms']:>9.1f}{rss:>9}"
+              f"{r['hit_rate']:>8.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,28 @@
 import os
-from sqlalchemy import create_engine, text
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
+from sqlmodel import Session
 import streamlit as st
 
 
+# -------------------------------------
+# SETTINGS (Cloud + Local)
+# -------------------------------------
+def get_setting(name, default=None):
+    """
+    Streamlit secrets first, then environment variables.
+    """
+    try:
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:   # no secrets file
+        pass
+    return os.getenv(name, default)
+
+
 # -------------------------------------
 # GET DATABASE URL (Cloud + Local)
 # -------------------------------------
@@ -32,13 +51,110 @@ def get_database_url():
 # -------------------------------------
 DATABASE_URL = get_database_url()
 
+# Postgres pool; both Streamlit apps hold one pool each
+DB_POOL_SIZE = int(get_setting("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(get_setting("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(get_setting("DB_POOL_RECYCLE", 1800))   # seconds
+DB_POOL_TIMEOUT = int(get_setting("DB_POOL_TIMEOUT", 30))
+
+# how long a SQLite writer waits for another process's lock
+SQLITE_BUSY_TIMEOUT_MS = int(get_setting("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+
+def engine_options(url):
+    if url.startswith("sqlite"):
+        return {
+            # Streamlit serves each browser session on its own thread
+            "connect_args": {"check_same_thread": False},
+        }
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    WAL lets readers (both apps) run while one writer commits, instead
+    of the default rollback journal locking the whole file.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")   # durable enough with WAL, far fewer fsyncs
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-16000")    # KiB, per connection
+    cursor.close()
+
+
 engine = create_engine(
     DATABASE_URL,
     pool_pre_ping=True,   # prevents stale connection errors
-    echo=False
+    echo=False,
+    **engine_options(DATABASE_URL),
 )
 
-SessionLocal = sessionmaker(bind=engine)
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", set_sqlite_pragmas)
+
+# objects stay readable after commit, e.g. to match a case just saved
+SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+
+# -------------------------------------
+# UNIT OF WORK
+# -------------------------------------
+_current_session = ContextVar("current_session", default=None)
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Shares one session (one pool checkout) across every db_queries call
+    made inside the block, e.g. everything one page render reads:
+
+        with unit_of_work():
+            counts = db_queries.get_case_counts(name)
+            cases = db_queries.list_registered_cases()
+
+    Commits at the end, rolls back on error. db_queries write functions
+    still commit when they return, so a later error does not undo them.
+    Nested blocks join the outer one. The session is tracked in a
+    ContextVar, so concurrent Streamlit sessions (threads) never share it.
+    """
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    session = SessionLocal()
+    token = _current_session.set(session)
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        _current_session.reset(token)
+        session.close()
+
+
+@contextmanager
+def get_session():
+    """
+    Session for a single query function: the current unit of work's if
+    there is one, otherwise a short-lived session of its own.
+    """
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    with SessionLocal() as session:
+        yield session
 
 
 # -------------------------------------
@@ -1,15 +1,26 @@
 from uuid import uuid4
 from datetime import datetime
+from sqlalchemy import Column, Index, LargeBinary, UniqueConstraint
 from sqlmodel import Field, create_engine, SQLModel
 
 
 class PublicSubmissions(SQLModel, table=True):
-    __table_args__ = {"extend_existing": True}
+    # keep in sync with the index migration in migrate_db.py
+    __table_args__ = (
+        Index("ix_publicsubmissions_status_submitted_on", "status", "submitted_on"),
+        Index("ix_publicsubmissions_submitted_on", "submitted_on"),
+        {"extend_existing": True},
+    )
 
     id: str = Field(primary_key=True, default_factory=lambda: str(uuid4()))
     submitted_by: str = Field(max_length=128, nullable=True)
     face_mesh: str = Field(nullable=False)
+    face_embedding: bytes = Field(
+        default=None, sa_column=Column(LargeBinary, nullable=True)
+    )   # float32 little-endian, see helper/embeddings.py
     image_path: str = Field(nullable=False)   # 🔥 REAL FILE PATH
+    thumbnail_path: str = Field(default=None, nullable=True)   # see helper/renditions.py
+    medium_path: str = Field(default=None, nullable=True)
     location: str = Field(max_length=128, nullable=True)
     mobile: str = Field(max_length=10, nullable=False)
     email: str = Field(max_length=64, nullable=True)
@@ -18,10 +29,49 @@ class PublicSubmissions(SQLModel, table=True):
     status: str = Field(max_length=16, nullable=False)
     birth_marks: str = Field(max_length=512, nullable=True)
     submitted_on: datetime = Field(default_factory=datetime.utcnow)
+    # set by every status write; galleries only re-read recent changes
+    status_changed_on: datetime = Field(default=None, nullable=True, index=True)
+
+
+class SubmissionFaces(SQLModel, table=True):
+    """
+    One detected face of a public submission; group photos have several.
+    The matcher searches these rows, PublicSubmissions.face_embedding
+    only keeps the most confident face.
+    """
+    __table_args__ = (
+        UniqueConstraint("public_case_id", "face_index", name="uq_submissionfaces_face"),
+        {"extend_existing": True},
+    )
+
+    id: str = Field(primary_key=True, default_factory=lambda: str(uuid4()))
+    public_case_id: str = Field(nullable=False, index=True)   # PublicSubmissions.id
+    face_index: int = Field(nullable=False)   # 0 = most confident detection
+    # box in original-image pixels; None for faces carried over from
+    # submissions made before faces were stored separately
+    bbox_x1: float = Field(default=None, nullable=True)
+    bbox_y1: float = Field(default=None, nullable=True)
+    bbox_x2: float = Field(default=None, nullable=True)
+    bbox_y2: float = Field(default=None, nullable=True)
+    det_score: float = Field(default=None, nullable=True)
+    face_embedding: bytes = Field(
+        sa_column=Column(LargeBinary, nullable=False)
+    )   # float32 little-endian, see helper/embeddings.py
+    created_on: datetime = Field(default_factory=datetime.utcnow)
 
 
 class RegisteredCases(SQLModel, table=True):
-    __table_args__ = {"extend_existing": True}
+    # keep in sync with the index migrations in migrate_db.py
+    __table_args__ = (
+        # id last: keyset pages order by (submitted_on, id)
+        Index(
+            "ix_registeredcases_submitted_by_status",
+            "submitted_by", "status", "submitted_on", "id",
+        ),
+        Index("ix_registeredcases_status_submitted_on", "status", "submitted_on", "id"),
+        Index("ix_registeredcases_submitted_on_id", "submitted_on", "id"),
+        {"extend_existing": True},
+    )
 
     id: str = Field(primary_key=True, default_factory=lambda: str(uuid4()))
     submitted_by: str = Field(max_length=64, nullable=False)
@@ -36,13 +86,61 @@ class RegisteredCases(SQLModel, table=True):
     last_seen: str = Field(max_length=64)
     address: str = Field(max_length=512)
     face_mesh: str = Field(nullable=False)
+    face_embedding: bytes = Field(
+        default=None, sa_column=Column(LargeBinary, nullable=True)
+    )   # float32 little-endian, see helper/embeddings.py
     image_path: str = Field(nullable=False)   # 🔥 REAL FILE PATH
+    thumbnail_path: str = Field(default=None, nullable=True)   # see helper/renditions.py
+    medium_path: str = Field(default=None, nullable=True)
     submitted_on: datetime = Field(default_factory=datetime.utcnow)
     status: str = Field(max_length=16, nullable=False)
+    # set by every status write; galleries only re-read recent changes
+    status_changed_on: datetime = Field(default=None, nullable=True, index=True)
     birth_marks: str = Field(max_length=512)
     matched_with: str = Field(nullable=True)
 
 
+class MatchCandidates(SQLModel, table=True):
+    """
+    Scored (registered case, public submission) pair waiting for an
+    officer to confirm or reject it. Written by match_worker.py and by
+    the on-insert matcher; one row per pair, ever.
+    """
+    __table_args__ = (
+        UniqueConstraint(
+            "registered_case_id", "public_case_id", name="uq_matchcandidates_pair"
+        ),
+        Index("ix_matchcandidates_status_score", "status", "score"),
+        {"extend_existing": True},
+    )
+
+    id: str = Field(primary_key=True, default_factory=lambda: str(uuid4()))
+    registered_case_id: str = Field(nullable=False, index=True)
+    public_case_id: str = Field(nullable=False, index=True)
+    score: float = Field(nullable=False)
+    # pending / confirmed / rejected / superseded (a case was resolved otherwise)
+    status: str = Field(max_length=16, nullable=False, default="pending")
+    run_id: str = Field(nullable=True)   # MatchRuns.id; None when matched on insert
+    created_on: datetime = Field(default_factory=datetime.utcnow)
+    resolved_on: datetime = Field(default=None, nullable=True)
+    resolved_by: str = Field(max_length=64, default=None, nullable=True)
+
+
+class MatchRuns(SQLModel, table=True):
+    __table_args__ = {"extend_existing": True}
+
+    id: str = Field(primary_key=True, default_factory=lambda: str(uuid4()))
+    started_on: datetime = Field(default_factory=datetime.utcnow)
+    finished_on: datetime = Field(default=None, nullable=True)
+    status: str = Field(max_length=16, nullable=False, default="running")   # running / done / failed
+    registered_count: int = Field(default=0)
+    public_count: int = Field(default=0)
+    scored_count: int = Field(default=0)       # public submissions queried this run
+    candidate_count: int = Field(default=0)    # new candidate pairs written
+    superseded_count: int = Field(default=0)
+    message: str = Field(max_length=512, default=None, nullable=True)
+
+
 # ---------------- DB INIT ---------------- #
 
 if __name__ == "__main__":
@@ -1,111 +1,384 @@
+import threading
+import traceback
+from datetime import datetime, time, timedelta
+
 import streamlit as st
-from sqlmodel import SQLModel, Session, select
-from helper.data_models import RegisteredCases, PublicSubmissions
-from db_connection import get_engine
+from sqlalchemy import and_, case, func, or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from helper import embeddings
+from helper.query_cache import cached_query, invalidate
+from helper.data_models import (
+    MatchCandidates,
+    MatchRuns,
+    PublicSubmissions,
+    RegisteredCases,
+    SubmissionFaces,
+)
+from db_connection import get_engine, get_session
 
 # ---------------- DATABASE CONNECTION ---------------- #
 
 engine = get_engine()
 
+REGISTERED = RegisteredCases.__tablename__
+PUBLIC = PublicSubmissions.__tablename__
+CANDIDATES = MatchCandidates.__tablename__
+
+# ids per IN (...) list
+ID_CHUNK_SIZE = 500
+
+
+# ---------------- SCHEMA CHECK ---------------- #
+
+_schema_checked = False
+_schema_lock = threading.Lock()
 
-# ---------------- CREATE TABLES ---------------- #
 
 def create_db():
-    SQLModel.metadata.create_all(engine)
+    """
+    Makes sure the schema is current, once per process. Pages call this
+    on every rerun, so after the first call it returns immediately.
+
+    A brand-new, empty database is created here. An existing database
+    that is behind is never migrated from a page request (backfills can
+    take long); the page stops and asks for `python migrate_db.py`.
+    """
+    global _schema_checked
+    if _schema_checked:
+        return
+
+    with _schema_lock:
+        if _schema_checked:
+            return
+
+        import migrate_db   # only needed on the first call
+
+        try:
+            current = migrate_db.get_schema_version()
+            if current < migrate_db.LATEST_VERSION and migrate_db.is_empty_database():
+                current = migrate_db.migrate()
+            _schema_checked = current >= migrate_db.LATEST_VERSION
+        except Exception:
+            traceback.print_exc()
+            return
+
+    if not _schema_checked:
+        st.error(
+            f"The database schema is at version {current}, this app needs version "
+            f"{migrate_db.LATEST_VERSION}. Ask the operator to run `python migrate_db.py`."
+        )
+        st.stop()
 
 
 # ---------------- INSERT ---------------- #
 
 def register_new_case(case_details: RegisteredCases):
-    with Session(engine) as session:
+    """
+    Saves the case, then matches it against the public submissions.
+
+    Returns:
+        dict - match result, see match_algo.match_new_registered_case
+    """
+    case_id = case_details.id
+    owner = case_details.submitted_by
+    embedding = embeddings.from_row(case_details.face_embedding, case_details.face_mesh)
+
+    with get_session() as session:
         session.add(case_details)
         session.commit()
+        invalidate(REGISTERED, owners=[owner])
 
+    return _match_on_insert("match_new_registered_case", case_id, embedding)
 
-def new_public_case(public_case_details: PublicSubmissions):
-    with Session(engine) as session:
+
+def new_public_case(public_case_details: PublicSubmissions, faces=None):
+    """
+    Saves the submission together with one SubmissionFaces row per
+    detected face, then matches every face against the registered cases.
+
+    Args:
+        faces: list of {"embedding", "bbox", "det_score"} from
+               helper/utils.py extract_faces; None stores only the
+               submission's own embedding, without a box
+
+    Returns:
+        dict - match result, see match_algo.match_new_public_case
+    """
+    case_id = public_case_details.id
+    face_rows = build_submission_faces(public_case_details, faces)
+
+    with get_session() as session:
         session.add(public_case_details)
+        session.add_all(face_rows)
         session.commit()
+        invalidate(PUBLIC)
+
+    face_embeddings = [embeddings.from_blob(face.face_embedding) for face in face_rows]
+    return _match_on_insert("match_new_public_case", case_id, face_embeddings or None)
+
+
+def build_submission_faces(public_case_details: PublicSubmissions, faces=None):
+    """
+    Returns:
+        list of SubmissionFaces, most confident first
+    """
+    if faces is None:
+        embedding = embeddings.from_row(
+            public_case_details.face_embedding, public_case_details.face_mesh
+        )
+        if embedding is None or not embedding.size:
+            return []
+        faces = [{"embedding": embedding, "bbox": [None] * 4, "det_score": None}]
+
+    return [
+        SubmissionFaces(
+            public_case_id=public_case_details.id,
+            face_index=face_index,
+            bbox_x1=face["bbox"][0],
+            bbox_y1=face["bbox"][1],
+            bbox_x2=face["bbox"][2],
+            bbox_y2=face["bbox"][3],
+            det_score=face["det_score"],
+            face_embedding=embeddings.to_blob(face["embedding"]),
+        )
+        for face_index, face in enumerate(faces)
+    ]
+
+
+def register_cases_bulk(cases):
+    """
+    Inserts many RegisteredCases in one transaction. Ids are set on the
+    objects up front, so the flush sends batched multi-row INSERTs.
+    New rows are left to the next match run instead of matching each one.
+
+    Returns:
+        int - number of rows inserted
+    """
+    owners = {case.submitted_by for case in cases}
+
+    with get_session() as session:
+        session.add_all(cases)
+        session.commit()
+        invalidate(REGISTERED, owners=owners)
+    return len(cases)
+
+
+def existing_registered_ids(case_ids):
+    """
+    Returns:
+        set - the ids in `case_ids` that are already saved
+    """
+    existing = set()
+    with get_session() as session:
+        for start in range(0, len(case_ids), ID_CHUNK_SIZE):
+            existing.update(
+                session.exec(
+                    select(RegisteredCases.id).where(
+                        RegisteredCases.id.in_(case_ids[start : start + ID_CHUNK_SIZE])
+                    )
+                ).all()
+            )
+    return existing
+
+
+def _match_on_insert(matcher_name, case_id, embedding):
+    # The row is already saved; a matching failure must not undo that.
+    if embedding is None:
+        return None
+    try:
+        from helper import match_algo   # match_algo imports this module
+
+        return getattr(match_algo, matcher_name)(case_id, embedding)
+    except Exception:
+        traceback.print_exc()
+        return None
 
 
 # ---------------- FETCH ---------------- #
 
-def fetch_registered_cases(submitted_by: str, status: str):
-    if status == "All":
-        status = ["F", "NF"]
-    elif status == "Found":
-        status = ["F"]
+def _status_values(status: str):
+    if status == "Found":
+        return ["F"]
     elif status == "Not Found":
-        status = ["NF"]
+        return ["NF"]
+    elif status in ("F", "NF"):
+        return [status]
+    return ["F", "NF"]   # "All", "Public Cases", None
 
-    with Session(engine) as session:
-        result = session.exec(
-            select(RegisteredCases)
-            .where(RegisteredCases.submitted_by == submitted_by)
-            .where(RegisteredCases.status.in_(status))
-        ).all()
-        return result
 
+def _date_range(model, start_date=None, end_date=None):
+    """
+    WHERE clauses for submitted_on between two dates, both inclusive.
+    Dates are compared in UTC, the time base of submitted_on.
+    """
+    filters = []
+    if start_date is not None:
+        filters.append(model.submitted_on >= datetime.combine(start_date, time.min))
+    if end_date is not None:
+        next_day = datetime.combine(end_date + timedelta(days=1), time.min)
+        filters.append(model.submitted_on < next_day)
+    return filters
 
-def fetch_public_cases(train_data: bool, status: str):
-    with Session(engine) as session:
+
+@cached_query(PUBLIC)
+def fetch_public_cases(train_data: bool, status: str, start_date=None, end_date=None):
+    """
+    Args:
+        train_data: only id + embedding columns, for matching
+        status: "All" / "Found" / "Not Found" (or "F" / "NF")
+        start_date, end_date: optional datetime.date bounds on submitted_on
+    """
+    status = _status_values(status)
+
+    with get_session() as session:
         if train_data:
             result = session.exec(
                 select(
                     PublicSubmissions.id,
+                    PublicSubmissions.face_embedding,
                     PublicSubmissions.face_mesh,
-                ).where(PublicSubmissions.status == status)
+                )
+                .where(PublicSubmissions.status.in_(status))
+                .where(*_date_range(PublicSubmissions, start_date, end_date))
             ).all()
         else:
-            result = session.exec(select(PublicSubmissions)).all()
+            result = session.exec(
+                select(PublicSubmissions)
+                .where(PublicSubmissions.status.in_(status))
+                .where(*_date_range(PublicSubmissions, start_date, end_date))
+                .order_by(PublicSubmissions.submitted_on.desc())
+            ).all()
         return result
 
 
-def get_registered_case_detail(case_id: str):
-    with Session(engine) as session:
-        result = session.exec(
-            select(
-                RegisteredCases.name,
-                RegisteredCases.complainant_mobile,
-                RegisteredCases.age,
-                RegisteredCases.last_seen,
-                RegisteredCases.birth_marks,
-                RegisteredCases.image_path,
-            ).where(RegisteredCases.id == case_id)
-        ).all()
-        return result
+# ---------------- PAGINATED LISTINGS ---------------- #
 
+PAGE_SIZE = 20
 
-def get_public_case_detail(case_id: str):
-    with Session(engine) as session:
-        result = session.exec(
-            select(
-                PublicSubmissions.location,
-                PublicSubmissions.submitted_by,
-                PublicSubmissions.mobile,
-                PublicSubmissions.birth_marks,
-                PublicSubmissions.image_path,
-            ).where(PublicSubmissions.id == case_id)
-        ).all()
-        return result
+# everything the case lists show; leaves out face_mesh / face_embedding
+REGISTERED_LIST_COLUMNS = [
+    RegisteredCases.id,
+    RegisteredCases.submitted_by,
+    RegisteredCases.name,
+    RegisteredCases.father_name,
+    RegisteredCases.age,
+    RegisteredCases.complainant_mobile,
+    RegisteredCases.last_seen,
+    RegisteredCases.image_path,
+    RegisteredCases.thumbnail_path,
+    RegisteredCases.medium_path,
+    RegisteredCases.submitted_on,
+    RegisteredCases.status,
+    RegisteredCases.matched_with,
+]
 
 
-# ---------------- NEW FUNCTION FOR MOBILE APP ---------------- #
+def _keyset_page(session, columns, model, filters, after, limit):
+    """
+    Newest-first page ordered by (submitted_on, id). `after` is the cursor
+    returned with the previous page; the query seeks straight to it
+    instead of OFFSET-scanning the rows before it.
+    """
+    query = select(*columns).where(*filters)
+
+    if after is not None:
+        submitted_on, case_id = after
+        query = query.where(
+            or_(
+                model.submitted_on < submitted_on,
+                and_(model.submitted_on == submitted_on, model.id < case_id),
+            )
+        )
+
+    rows = session.exec(
+        query.order_by(model.submitted_on.desc(), model.id.desc()).limit(limit + 1)
+    ).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1].submitted_on, rows[-1].id)
+    return rows, next_cursor
+
 
-def get_all_cases():
+@cached_query(REGISTERED, owner="submitted_by")
+def list_registered_cases(status=None, submitted_by=None, after=None, limit=PAGE_SIZE):
     """
-    Fetch all registered police cases.
-    Used by the mobile app.
+    One page of registered cases without the embedding columns.
+
+    Args:
+        status: "F" / "NF", or None for both
+        submitted_by: officer name, or None for everyone
+        after: cursor from the previous page, None for the first page
+
+    Returns:
+        (rows, next_cursor) - next_cursor is None on the last page
     """
-    with Session(engine) as session:
-        result = session.exec(select(RegisteredCases)).all()
+    filters = []
+    if status is not None:
+        filters.append(RegisteredCases.status == status)
+    if submitted_by is not None:
+        filters.append(RegisteredCases.submitted_by == submitted_by)
+
+    with get_session() as session:
+        return _keyset_page(
+            session, REGISTERED_LIST_COLUMNS, RegisteredCases, filters, after, limit
+        )
+
+
+# ---------------- JOINED FETCH ---------------- #
+
+@cached_query(REGISTERED, PUBLIC, owner="submitted_by")
+def fetch_registered_cases_with_matches(
+    submitted_by: str, status: str, start_date=None, end_date=None
+):
+    """
+    Registered cases together with the public submission each one was
+    matched with, in one LEFT OUTER JOIN instead of one lookup per case.
+    Embedding columns are left out.
+
+    Args:
+        status: "All" / "Found" / "Not Found"
+        start_date, end_date: optional datetime.date bounds on submitted_on
+
+    Returns:
+        list of rows - the REGISTERED_LIST_COLUMNS plus matched_id,
+        matched_location, matched_submitted_by, matched_mobile,
+        matched_birth_marks and matched_image_path (all None for
+        unmatched cases)
+    """
+    status = _status_values(status)
+
+    with get_session() as session:
+        result = session.exec(
+            select(
+                *REGISTERED_LIST_COLUMNS,
+                PublicSubmissions.id.label("matched_id"),
+                PublicSubmissions.location.label("matched_location"),
+                PublicSubmissions.submitted_by.label("matched_submitted_by"),
+                PublicSubmissions.mobile.label("matched_mobile"),
+                PublicSubmissions.birth_marks.label("matched_birth_marks"),
+                func.coalesce(
+                    PublicSubmissions.thumbnail_path, PublicSubmissions.image_path
+                ).label("matched_image_path"),
+            )
+            .outerjoin(
+                PublicSubmissions,
+                PublicSubmissions.id == RegisteredCases.matched_with,
+            )
+            .where(RegisteredCases.submitted_by == submitted_by)
+            .where(RegisteredCases.status.in_(status))
+            .where(*_date_range(RegisteredCases, start_date, end_date))
+            .order_by(RegisteredCases.submitted_on.desc(), RegisteredCases.id.desc())
+        ).all()
         return result
 
 
 # ---------------- MATCH UPDATE ---------------- #
 
 def update_found_status(register_case_id: str, public_case_id: str):
-    with Session(engine) as session:
+    with get_session() as session:
         registered_case = session.exec(
             select(RegisteredCases).where(RegisteredCases.id == register_case_id)
         ).one()
@@ -114,70 +387,425 @@ def update_found_status(register_case_id: str, public_case_id: str):
             select(PublicSubmissions).where(PublicSubmissions.id == public_case_id)
         ).one()
 
+        now = datetime.utcnow()
         registered_case.status = "F"
+        registered_case.status_changed_on = now
         registered_case.matched_with = public_case_id
         public_case.status = "F"
+        public_case.status_changed_on = now
 
         session.add(registered_case)
         session.add(public_case)
         session.commit()
-
-
-# ---------------- ML SUPPORT ---------------- #
-
-def get_training_data(submitted_by: str):
-    with Session(engine) as session:
-        result = session.exec(
-            select(
-                RegisteredCases.id,
-                RegisteredCases.face_mesh
-            )
-            .where(RegisteredCases.submitted_by == submitted_by)
-            .where(RegisteredCases.status == "NF")
-        ).all()
-        return result
+        invalidate(REGISTERED, owners=[registered_case.submitted_by])
+        invalidate(PUBLIC)
 
 
 # ---------------- UTILS ---------------- #
 
 def update_registered_case_status(case_id: str, status: str):
-    with Session(engine) as session:
+    with get_session() as session:
         case = session.exec(
             select(RegisteredCases).where(RegisteredCases.id == case_id)
         ).first()
         if case:
             case.status = status
+            case.status_changed_on = datetime.utcnow()
             session.add(case)
             session.commit()
+            invalidate(REGISTERED, owners=[case.submitted_by])
 
 
 def update_public_case_status(case_id: str, status: str):
-    with Session(engine) as session:
+    with get_session() as session:
         case = session.exec(
             select(PublicSubmissions).where(PublicSubmissions.id == case_id)
         ).first()
         if case:
             case.status = status
+            case.status_changed_on = datetime.utcnow()
             session.add(case)
             session.commit()
+            invalidate(PUBLIC)
 
 
 # ---------------- COUNT ---------------- #
 
-def get_registered_cases_count(submitted_by: str, status: str):
-    with Session(engine) as session:
+@cached_query(REGISTERED, owner="submitted_by")
+def get_case_counts(submitted_by: str = None):
+    """
+    Registered cases per status, in one GROUP BY query (cached).
+
+    Returns:
+        dict - {"F": int, "NF": int}
+    """
+    query = select(RegisteredCases.status, func.count()).group_by(
+        RegisteredCases.status
+    )
+    if submitted_by is not None:
+        query = query.where(RegisteredCases.submitted_by == submitted_by)
+
+    with get_session() as session:
+        counts = {"F": 0, "NF": 0}
+        counts.update(dict(session.exec(query).all()))
+        return counts
+
+
+@cached_query(REGISTERED)
+def get_case_count_breakdown(per_user: bool = True, per_day: bool = False, since=None):
+    """
+    Registered cases per status and, optionally, per officer and per
+    submission day, in one GROUP BY query (cached).
+
+    Args:
+        since: only count cases submitted on or after this datetime
+
+    Returns:
+        list of rows with `status`, `count` and, when requested,
+        `submitted_by` and `day`
+    """
+    columns = [RegisteredCases.status]
+    if per_user:
+        columns.append(RegisteredCases.submitted_by)
+    if per_day:
+        columns.append(func.date(RegisteredCases.submitted_on).label("day"))
+
+    query = select(*columns, func.count().label("count")).group_by(*columns)
+    if since is not None:
+        query = query.where(RegisteredCases.submitted_on >= since)
+
+    with get_session() as session:
+        return session.exec(query.order_by(*columns)).all()
+
+
+# ---------------- LINK CASES ---------------- #
+
+LINK_RETRIES = 3
+
+
+def link_cases_bulk(pairs):
+    """
+    Marks many (registered_case_id, public_case_id) pairs as found in one
+    transaction, using set-based conditional UPDATEs (WHERE status='NF').
+
+    Pairs are taken in order, so pass them best-score first: a case that
+    already appears in an earlier pair is skipped.
+
+    Always runs in its own session, even inside a unit_of_work, since a
+    retry rolls back its transaction.
+
+    Returns:
+        list of (registered_case_id, public_case_id) pairs actually applied
+    """
+    pending, seen_reg, seen_pub = [], set(), set()
+    for reg_id, pub_id in pairs:
+        if reg_id in seen_reg or pub_id in seen_pub:
+            continue
+        seen_reg.add(reg_id)
+        seen_pub.add(pub_id)
+        pending.append((reg_id, pub_id))
+
+    if not pending:
+        return []
+
+    for _ in range(LINK_RETRIES):
+        with Session(engine) as session:
+            open_reg = set(
+                session.exec(
+                    select(RegisteredCases.id)
+                    .where(RegisteredCases.id.in_([reg for reg, _ in pending]))
+                    .where(RegisteredCases.status == "NF")
+                    .with_for_update()
+                ).all()
+            )
+            open_pub = set(
+                session.exec(
+                    select(PublicSubmissions.id)
+                    .where(PublicSubmissions.id.in_([pub for _, pub in pending]))
+                    .where(PublicSubmissions.status == "NF")
+                    .with_for_update()
+                ).all()
+            )
+
+            applied = [
+                (reg, pub) for reg, pub in pending if reg in open_reg and pub in open_pub
+            ]
+            if not applied:
+                return []
+
+            now = datetime.utcnow()
+            reg_updated = session.execute(
+                update(RegisteredCases)
+                .where(RegisteredCases.id.in_([reg for reg, _ in applied]))
+                .where(RegisteredCases.status == "NF")
+                .values(
+                    status="F",
+                    status_changed_on=now,
+                    matched_with=case(dict(applied), value=RegisteredCases.id),
+                )
+            ).rowcount
+            pub_updated = session.execute(
+                update(PublicSubmissions)
+                .where(PublicSubmissions.id.in_([pub for _, pub in applied]))
+                .where(PublicSubmissions.status == "NF")
+                .values(status="F", status_changed_on=now)
+            ).rowcount
+
+            # Another writer got in between the SELECT and the UPDATEs:
+            # roll back so no pair is half-applied, then re-check.
+            if reg_updated == pub_updated == len(applied):
+                session.commit()
+                # owners aren't loaded here; linking is rare, drop them all
+                invalidate(REGISTERED, PUBLIC)
+                return applied
+            session.rollback()
+
+    return []
+
+
+# ---------------- MATCH CANDIDATES ---------------- #
+
+
+def record_match_candidates(candidates, run_id=None):
+    """
+    Stores scored (registered, public) pairs for officers to review.
+    A pair is recorded once, ever: pairs that already exist in any status
+    (including rejected) are skipped, so re-running the matcher is
+    idempotent and never revives a rejected pair.
+
+    Args:
+        candidates: iterable of (registered_case_id, public_case_id, score)
+        run_id: MatchRuns.id of the worker run, None for on-insert matching
+
+    Returns:
+        list of (registered_case_id, public_case_id, score) newly recorded
+    """
+    best = {}
+    for reg_id, pub_id, score in candidates:
+        if score > best.get((reg_id, pub_id), float("-inf")):
+            best[(reg_id, pub_id)] = float(score)
+
+    if not best:
+        return []
+
+    pub_ids = list({pub_id for _, pub_id in best})
+
+    for _ in range(LINK_RETRIES):
+        with Session(engine) as session:
+            existing = set()
+            for start in range(0, len(pub_ids), ID_CHUNK_SIZE):
+                rows = session.exec(
+                    select(
+                        MatchCandidates.registered_case_id,
+                        MatchCandidates.public_case_id,
+                    ).where(
+                        MatchCandidates.public_case_id.in_(
+                            pub_ids[start : start + ID_CHUNK_SIZE]
+                        )
+                    )
+                ).all()
+                existing.update(tuple(row) for row in rows)
+
+            new = [
+                (reg_id, pub_id, score)
+                for (reg_id, pub_id), score in best.items()
+                if (reg_id, pub_id) not in existing
+            ]
+            if not new:
+                return []
+
+            session.add_all(
+                MatchCandidates(
+                    registered_case_id=reg_id,
+                    public_case_id=pub_id,
+                    score=score,
+                    run_id=run_id,
+                )
+                for reg_id, pub_id, score in new
+            )
+            try:
+                session.commit()
+            except IntegrityError:
+                # the worker and an on-insert match recorded a pair at the
+                # same time: re-read what exists and try again
+                session.rollback()
+                continue
+
+            invalidate(CANDIDATES)
+            return new
+
+    return []
+
+
+def fetch_pending_candidates(submitted_by: str, limit: int = 50):
+    """
+    Pending candidates for an officer's open cases, best score first,
+    with both sides' details in one query. Pairs where either side has
+    been resolved in the meantime are left out.
+
+    Not cached: the worker writes candidates from another process.
+
+    Returns:
+        list of rows - candidate_id, score, created_on, registered_case_id,
+        name, complainant_mobile, age, last_seen, birth_marks, image_path,
+        public_case_id, location, public_submitted_by, public_mobile,
+        public_birth_marks, public_image_path
+    """
+    with get_session() as session:
         result = session.exec(
-            select(RegisteredCases)
+            select(
+                MatchCandidates.id.label("candidate_id"),
+                MatchCandidates.score,
+                MatchCandidates.created_on,
+                RegisteredCases.id.label("registered_case_id"),
+                RegisteredCases.name,
+                RegisteredCases.complainant_mobile,
+                RegisteredCases.age,
+                RegisteredCases.last_seen,
+                RegisteredCases.birth_marks,
+                func.coalesce(
+                    RegisteredCases.medium_path, RegisteredCases.image_path
+                ).label("image_path"),
+                PublicSubmissions.id.label("public_case_id"),
+                PublicSubmissions.location,
+                PublicSubmissions.submitted_by.label("public_submitted_by"),
+                PublicSubmissions.mobile.label("public_mobile"),
+                PublicSubmissions.birth_marks.label("public_birth_marks"),
+                func.coalesce(
+                    PublicSubmissions.medium_path, PublicSubmissions.image_path
+                ).label("public_image_path"),
+            )
+            .join(RegisteredCases, RegisteredCases.id == MatchCandidates.registered_case_id)
+            .join(PublicSubmissions, PublicSubmissions.id == MatchCandidates.public_case_id)
+            .where(MatchCandidates.status == "pending")
             .where(RegisteredCases.submitted_by == submitted_by)
-            .where(RegisteredCases.status == status)
+            .where(RegisteredCases.status == "NF")
+            .where(PublicSubmissions.status == "NF")
+            .order_by(MatchCandidates.score.desc())
+            .limit(limit)
         ).all()
         return result
 
 
-# ---------------- LINK CASES ---------------- #
+def resolve_candidate(candidate_id: str, confirm: bool, resolved_by: str = None):
+    """
+    Confirm (link the two cases as found) or reject a pending candidate.
+    Confirming supersedes the other pending candidates of both cases.
+
+    Returns:
+        str - the candidate's new status: "confirmed", "rejected", or
+        "superseded" when one side was already matched elsewhere;
+        None if the candidate was not pending
+    """
+    with Session(engine) as session:
+        candidate = session.get(MatchCandidates, candidate_id)
+        if candidate is None or candidate.status != "pending":
+            return None
+        reg_id, pub_id = candidate.registered_case_id, candidate.public_case_id
+
+    status = "rejected"
+    if confirm:
+        status = "confirmed" if link_cases_bulk([(reg_id, pub_id)]) else "superseded"
+
+    now = datetime.utcnow()
+    with Session(engine) as session:
+        updated = session.execute(
+            update(MatchCandidates)
+            .where(MatchCandidates.id == candidate_id)
+            .where(MatchCandidates.status == "pending")
+            .values(status=status, resolved_on=now, resolved_by=resolved_by)
+        ).rowcount
+
+        if status == "confirmed":
+            session.execute(
+                update(MatchCandidates)
+                .where(MatchCandidates.status == "pending")
+                .where(
+                    or_(
+                        MatchCandidates.registered_case_id == reg_id,
+                        MatchCandidates.public_case_id == pub_id,
+                    )
+                )
+                .values(status="superseded", resolved_on=now)
+            )
+        session.commit()
 
-def link_cases(registered_case_id: str, public_case_id: str):
+    invalidate(CANDIDATES)
+    return status if updated else None
+
+
+def expire_candidates():
+    """
+    Marks pending candidates as superseded once either case is no longer
+    NF (matched through another candidate, or changed by hand).
+
+    Returns:
+        int - number of candidates superseded
+    """
+    with Session(engine) as session:
+        superseded = session.execute(
+            update(MatchCandidates)
+            .where(MatchCandidates.status == "pending")
+            .where(
+                or_(
+                    MatchCandidates.registered_case_id.in_(
+                        select(RegisteredCases.id).where(RegisteredCases.status != "NF")
+                    ),
+                    MatchCandidates.public_case_id.in_(
+                        select(PublicSubmissions.id).where(PublicSubmissions.status != "NF")
+                    ),
+                )
+            )
+            .values(status="superseded", resolved_on=datetime.utcnow())
+        ).rowcount
+        session.commit()
+
+    if superseded:
+        invalidate(CANDIDATES)
+    return superseded
+
+
+# ---------------- MATCH RUNS ---------------- #
+
+def start_match_run():
     """
-    Wrapper used by match_algo.py
+    Returns:
+        str - id of the new MatchRuns row
     """
-    update_found_status(registered_case_id, public_case_id)
+    run = MatchRuns()
+    run_id = run.id
+    with Session(engine) as session:
+        session.add(run)
+        session.commit()
+    return run_id
+
+
+def finish_match_run(run_id: str, status: str, message: str = None, **counts):
+    """
+    Args:
+        status: "done" / "failed"
+        counts: registered_count, public_count, scored_count,
+                candidate_count, superseded_count
+    """
+    with Session(engine) as session:
+        session.execute(
+            update(MatchRuns)
+            .where(MatchRuns.id == run_id)
+            .values(
+                status=status,
+                finished_on=datetime.utcnow(),
+                message=message[:512] if message else None,
+                **counts,
+            )
+        )
+        session.commit()
+
+
+def get_last_match_run():
+    with get_session() as session:
+        return session.exec(
+            select(MatchRuns)
+            .where(MatchRuns.status != "running")
+            .order_by(MatchRuns.started_on.desc())
+            .limit(1)
+        ).first()
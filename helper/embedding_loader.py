@@ -0,0 +1,132 @@
+import numpy as np
+from sqlalchemy import func, join, null, select
+
+from helper import embeddings
+from helper.data_models import PublicSubmissions, SubmissionFaces
+from helper.db_queries import engine
+
+DEFAULT_YIELD_PER = 1000
+
+
+# ---------------- STREAMING LOADER ---------------- #
+
+def _filtered(query, model, status, since):
+    if status is not None:
+        query = query.where(model.status == status)
+    if since is not None:
+        query = query.where(model.submitted_on >= since)
+    return query
+
+
+def load_embeddings(model, status="NF", since=None,
+                    yield_per=DEFAULT_YIELD_PER):
+    """
+    Stream (id, embedding) rows of `model` straight into a preallocated
+    float32 matrix, without the ORM or pandas.
+
+    Filters run in SQL. Rows are fetched `yield_per` at a time through a
+    server-side cursor (where the driver supports one), so memory stays
+    close to the size of the final matrix.
+
+    Args:
+        model: RegisteredCases | PublicSubmissions
+        status: str | None - e.g. "NF"; None for any status
+        since: datetime | None - only rows with submitted_on >= since
+
+    Returns:
+        (ids, matrix, latest) - ids is an object array, matrix is
+        (N, 512) float32, latest is the newest submitted_on (or None)
+    """
+    count_query = _filtered(
+        select(func.count()).select_from(model), model, status, since
+    )
+    query = _filtered(
+        select(model.id, model.face_embedding, model.face_mesh, model.submitted_on),
+        model, status, since,
+    )
+
+    keys, matrix, latest = _stream(count_query, query, yield_per)
+    return keys[:, 0], matrix, latest
+
+
+def load_face_embeddings(status="NF", since=None, yield_per=DEFAULT_YIELD_PER):
+    """
+    Stream every stored face of public submissions (see SubmissionFaces),
+    filtered on the submission's status and submitted_on.
+
+    Returns:
+        (face_ids, public_ids, matrix, latest) - face_ids and public_ids
+        are object arrays, public_ids[i] being the submission face i
+        belongs to; latest is the newest submission submitted_on
+    """
+    joined = join(
+        SubmissionFaces, PublicSubmissions,
+        SubmissionFaces.public_case_id == PublicSubmissions.id,
+    )
+
+    count_query = _filtered(
+        select(func.count()).select_from(joined), PublicSubmissions, status, since
+    )
+    query = _filtered(
+        select(
+            SubmissionFaces.id,
+            SubmissionFaces.public_case_id,
+            SubmissionFaces.face_embedding,
+            null(),
+            PublicSubmissions.submitted_on,
+        ).select_from(joined),
+        PublicSubmissions, status, since,
+    )
+
+    keys, matrix, latest = _stream(count_query, query, yield_per)
+    return keys[:, 0], keys[:, 1], matrix, latest
+
+
+def latest_status_change(model):
+    """
+    Returns:
+        datetime | None - newest `status_changed_on` of `model`
+    """
+    with engine.connect() as conn:
+        return conn.execute(select(func.max(model.status_changed_on))).scalar()
+
+
+def _stream(count_query, query, yield_per):
+    """
+    Rows of `query` are (*keys, embedding blob, face_mesh, submitted_on).
+
+    Returns:
+        (keys, matrix, latest) - keys is an (N, number of keys) object array
+    """
+    dim = embeddings.EMBEDDING_DIM
+    width = len(query.selected_columns) - 3
+
+    with engine.connect() as conn:
+        capacity = conn.execute(count_query).scalar() or 0
+
+        keys = np.empty((capacity, width), dtype=object)
+        matrix = np.empty((capacity, dim), dtype=np.float32)
+        size = 0
+        latest = None
+
+        result = conn.execution_options(yield_per=yield_per).execute(query)
+        for row in result:
+            blob, face_mesh, submitted_on = row[width:]
+            if latest is None or submitted_on > latest:
+                latest = submitted_on
+
+            emb = embeddings.from_row(blob, face_mesh)
+            if emb is None or emb.shape[0] != dim:
+                continue
+
+            # rows inserted after the COUNT
+            if size == len(keys):
+                grow = max(2 * len(keys), 64)
+                keys = np.resize(keys, (grow, width))
+                matrix = np.resize(matrix, (grow, dim))
+
+            keys[size] = row[:width]
+            matrix[size] = emb
+            size += 1
+
+    return keys[:size], matrix[:size], latest
@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+
+# Face embeddings are stored as raw little-endian float32 bytes
+# (512 dims -> 2 KB per face) instead of JSON text.
+
+EMBEDDING_DIM = 512
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+# ---------------- ENCODE ---------------- #
+
+def to_blob(embedding) -> bytes:
+    """
+    Pack an embedding (list / numpy array) into float32 bytes.
+    """
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+# ---------------- DECODE ---------------- #
+
+def from_blob(blob) -> np.ndarray:
+    """
+    Read float32 bytes back into a 1-D numpy array (no copy).
+    """
+    return np.frombuffer(blob, dtype=EMBEDDING_DTYPE)
+
+
+def from_row(blob, face_mesh=None) -> np.ndarray:
+    """
+    Decode a row, falling back to the legacy JSON `face_mesh`
+    text when the binary column has not been backfilled yet.
+    """
+    if blob is not None:
+        return from_blob(blob)
+    if face_mesh:
+        return np.asarray(json.loads(face_mesh), dtype=EMBEDDING_DTYPE)
+    return None
+
+
+# ---------------- NORMALIZE ---------------- #
+
+def l2_normalize_rows(ids, matrix):
+    """
+    Row-wise L2 normalization.
+    Drops rows whose norm is zero or NaN.
+    """
+    norms = np.linalg.norm(matrix, axis=1)
+    keep = (norms > 0) & np.isfinite(norms)
+
+    ids = [row_id for row_id, ok in zip(ids, keep) if ok]
+    matrix = matrix[keep] / norms[keep, None]
+    return ids, matrix.astype(np.float32, copy=False)
@@ -0,0 +1,216 @@
+import os
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from helper import model_cache
+
+# ==============================
+# BATCH FACE EMBEDDING EXTRACTION
+# ==============================
+
+# No Streamlit here: this runs in scripts and worker processes.
+
+
+# Detector input sides are multiples of 32 (RetinaFace strides)
+DET_SIZE_STEP = 32
+MIN_DET_SIDE = 160
+
+# Group photos (uploads through helper/utils.py): besides the most
+# confident face, faces whose shorter box side (in original-image pixels)
+# is below MIN_FACE_SIZE, or whose detector score is below MIN_DET_SCORE,
+# are dropped before recognition. These are background faces and false
+# detections, too small or unsure to match on. Registration only uses
+# the most confident face, which is always kept; imports keep the
+# detector's own threshold.
+MIN_FACE_SIZE = int(os.getenv("MIN_FACE_SIZE", "32"))
+MIN_DET_SCORE = float(os.getenv("MIN_DET_SCORE", "0.6"))
+
+
+def adaptive_det_size(image_shape, max_det_size):
+    """
+    Detector input (width, height) that follows the image's aspect ratio,
+    never upscales small images and never exceeds `max_det_size`.
+    """
+    height, width = image_shape[:2]
+    ratio = min(1.0, max(max_det_size) / max(height, width))
+
+    def fit(side):
+        side = int(np.ceil(side * ratio / DET_SIZE_STEP)) * DET_SIZE_STEP
+        return max(MIN_DET_SIDE, side)
+
+    return fit(width), fit(height)
+
+
+def _downscale(image_bgr, max_side):
+    height, width = image_bgr.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return image_bgr, 1.0
+
+    scale = max_side / max(height, width)
+    size = (round(width * scale), round(height * scale))
+    return cv2.resize(image_bgr, size, interpolation=cv2.INTER_AREA), scale
+
+
+def _keep_face(bbox, det_score, min_size, min_score):
+    x1, y1, x2, y2 = bbox
+    return det_score >= min_score and min(x2 - x1, y2 - y1) >= min_size
+
+
+def _detect(app, image_bgr, det_size, min_size=0, min_score=0.0):
+    """
+    FaceAnalysis.get() with a per-call detector input size. Apart from the
+    most confident one, faces below the thresholds are dropped before the
+    recognition model runs on them.
+    """
+    from insightface.app.common import Face
+
+    bboxes, kpss = app.det_model.detect(image_bgr, input_size=det_size)
+
+    faces = []
+    for rank, i in enumerate(np.argsort(-bboxes[:, 4])):
+        if rank and not _keep_face(bboxes[i, 0:4], bboxes[i, 4], min_size, min_score):
+            continue
+        face = Face(
+            bbox=bboxes[i, 0:4],
+            kps=None if kpss is None else kpss[i],
+            det_score=bboxes[i, 4],
+        )
+        for taskname, model in app.models.items():
+            if taskname != "detection":
+                model.get(image_bgr, face)
+        faces.append(face)
+    return faces
+
+
+def faces_from_image(app, image_bgr: np.ndarray, profile=model_cache.DEFAULT_PROFILE,
+                     min_size=0, min_score=0.0):
+    """
+    Run detection + recognition on one BGR image, following the
+    preprocessing of `profile` (see helper/model_cache.py). A single
+    detection pass finds every face; apart from the most confident one,
+    faces below `min_size` pixels or `min_score` are skipped before
+    recognition (default: none are).
+
+    Returns:
+        list of dicts - {"embedding": float32 (512,), "bbox": [x1, y1, x2, y2],
+                         "det_score": float}, most confident first
+        bbox is in the coordinates of the original image.
+    """
+    config = model_cache.MODEL_PROFILES[profile]
+
+    image_bgr, scale = _downscale(image_bgr, config["max_side"])
+
+    det_size = config["det_size"]
+    if config["adaptive_det_size"]:
+        det_size = adaptive_det_size(image_bgr.shape, det_size)
+
+    # the detector sees the downscaled image
+    faces = _detect(app, image_bgr, det_size, min_size * scale, min_score)
+
+    faces = [
+        {
+            "embedding": face.embedding.astype(np.float32),
+            "bbox": [float(v) / scale for v in face.bbox],
+            "det_score": float(face.det_score),
+        }
+        for face in faces
+    ]
+    return sorted(faces, key=lambda face: face["det_score"], reverse=True)
+
+
+def _read_image(source):
+    """
+    File path -> BGR array; RGB array -> BGR array.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        image = cv2.imread(os.fspath(source))
+        if image is None:
+            raise ValueError(f"Could not read image: {source}")
+        return image
+    return cv2.cvtColor(np.asarray(source), cv2.COLOR_RGB2BGR)
+
+
+def _extract_one(source, profile, threads=None):
+    try:
+        app = model_cache.load_face_app(profile, threads)
+        faces = faces_from_image(app, _read_image(source), profile)
+        if not faces:
+            return {"status": False, "faces": [], "message": "No face detected"}
+        return {"status": True, "faces": faces, "message": "OK"}
+    except Exception as e:
+        traceback.print_exc()
+        return {"status": False, "faces": [], "message": str(e)}
+
+
+# ---------------- WORKER PROCESS ---------------- #
+
+_worker_config = {}
+
+
+def _init_worker(profile, threads):
+    # Each worker holds its own ONNX sessions
+    _worker_config["profile"] = profile
+    _worker_config["threads"] = threads
+    model_cache.load_face_app(profile, threads)
+
+
+def _worker_extract(source):
+    return _extract_one(source, _worker_config["profile"], _worker_config["threads"])
+
+
+# ---------------- PUBLIC API ---------------- #
+
+def create_pool(workers=None, profile=model_cache.DEFAULT_PROFILE, threads_per_worker=1):
+    """
+    Worker pool that can be reused across extract_embeddings_batch calls,
+    so each worker loads the model only once for a long job.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 1,
+        initializer=_init_worker,
+        initargs=(profile, threads_per_worker),
+    )
+
+
+def extract_embeddings_batch(sources, workers=None, profile=model_cache.DEFAULT_PROFILE,
+                             threads_per_worker=1, chunksize=4, executor=None):
+    """
+    Extract face embeddings from many images.
+
+    Args:
+        sources: iterable of file paths or RGB numpy arrays
+                 (paths are cheaper to send to worker processes)
+        workers: number of worker processes; 0 runs in this process,
+                 None uses every CPU
+        profile: model profile, see helper/model_cache.py
+        threads_per_worker: ONNX Runtime threads in each worker
+        executor: a pool from create_pool(); overrides workers/profile
+
+    Returns:
+        list of dicts, one per source and in the same order - {
+            "source": the input path, or its position for arrays
+            "status": bool - whether at least one face was found
+            "faces": list of {"embedding", "bbox", "det_score"}
+            "message": str
+        }
+    """
+    sources = list(sources)
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if executor is not None:
+        results = list(executor.map(_worker_extract, sources, chunksize=chunksize))
+    elif workers == 0 or len(sources) <= 1:
+        results = [_extract_one(source, profile) for source in sources]
+    else:
+        with create_pool(min(workers, len(sources)), profile, threads_per_worker) as pool:
+            results = list(pool.map(_worker_extract, sources, chunksize=chunksize))
+
+    for position, (source, result) in enumerate(zip(sources, results)):
+        is_path = isinstance(source, (str, os.PathLike))
+        result["source"] = os.fspath(source) if is_path else position
+
+    return results
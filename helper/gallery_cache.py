@@ -0,0 +1,504 @@
+import copy
+import glob
+import os
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlmodel import Session, select
+
+from helper import embedding_loader, embeddings, vector_index
+from helper.data_models import PublicSubmissions, RegisteredCases, SubmissionFaces
+from helper.db_queries import engine
+
+# ---------------- SETTINGS ---------------- #
+
+# `submitted_on` is set when the row object is built, not when it is
+# committed, so each refresh re-reads a small window before the
+# watermark to catch rows that were committed late.
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# Status flips back to NF are not tracked incrementally; a periodic
+# full reload picks those up.
+FULL_RELOAD_SECONDS = 60 * 60
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Gallery artifacts shared by the apps and the worker on this machine
+GALLERY_DIR = os.getenv("GALLERY_DIR", os.path.join(BASE_DIR, "models", "galleries"))
+
+# bump when the artifact layout changes; old files are then ignored
+GALLERY_FORMAT = 2
+
+
+# ---------------- GALLERY ---------------- #
+
+class EmbeddingGallery:
+    """
+    Long-lived, L2-normalized float32 gallery of one table's embeddings.
+
+    Loads once per process, then `refresh()` only pulls rows newer than
+    the `submitted_on` watermark and drops rows whose `status_changed_on`
+    is newer than the status watermark, so a refresh costs what changed,
+    not the size of the gallery.
+
+    Vectors live in an exact BruteForceIndex; `index_kind` optionally
+    keeps an approximate index (see helper/vector_index.py) in sync
+    for `query()`.
+
+    `version` goes up on every change. Full rebuilds (the first load,
+    then hourly) run without holding the lock and are swapped in; the
+    hourly one runs in a background thread, so no request waits for it.
+    See PersistentGallery for a gallery kept on disk between runs.
+    """
+
+    # attributes replaced together when a rebuilt gallery is swapped in
+    _STATE = ("_store", "index", "watermark", "status_watermark", "loaded_at")
+
+    def __init__(self, model, status="NF", index_kind=None):
+        self.model = model
+        self.status_model = model   # the table whose status is tracked
+        self.status = status
+        self.index_kind = index_kind
+        self.version = 0
+        self._lock = threading.RLock()
+        self._rebuild_lock = threading.Lock()   # one full rebuild at a time
+        self._reset()
+
+    def _reset(self):
+        self._store = vector_index.BruteForceIndex()
+        if self.index_kind in (None, vector_index.BruteForceIndex.kind):
+            self.index = self._store
+        else:
+            self.index = vector_index.create_index(self.index_kind)
+        self.watermark = None
+        self.status_watermark = None
+        self.loaded_at = None
+
+    # ---------------- READ ---------------- #
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, row_id):
+        return row_id in self._store
+
+    def snapshot(self):
+        """
+        Returns:
+            (ids, vectors) - a copy of the ids and a read-only view
+            of the normalized (N, 512) matrix
+        """
+        with self._lock:
+            return list(self._store.ids), self._store.vectors
+
+    def vector(self, row_id):
+        with self._lock:
+            return self._store.vector(row_id)
+
+    def query(self, vectors, k=1):
+        """
+        Top-k search against this gallery, see VectorIndex.query.
+        """
+        with self._lock:
+            return self.index.query(vectors, k)
+
+    # ---------------- REFRESH ---------------- #
+
+    def refresh(self):
+        """
+        Bring the gallery up to date with the database.
+        Returns self so calls can be chained.
+        """
+        if self.loaded_at is None:
+            with self._rebuild_lock:
+                if self.loaded_at is None:
+                    self._initial_load()
+
+        with self._lock:
+            stale = time.time() - self.loaded_at > FULL_RELOAD_SECONDS
+            self._drop_resolved()
+            self._load_new()
+
+        if stale:
+            self._start_rebuild()
+        return self
+
+    def reload(self):
+        """
+        Full rebuild now, in the calling thread.
+        """
+        with self._rebuild_lock:
+            self._rebuild()
+        return self.refresh()
+
+    # ---------------- FULL REBUILD ---------------- #
+
+    def _blank(self):
+        """
+        Empty gallery with the same settings, private to the caller.
+        """
+        blank = copy.copy(self)
+        blank._lock = threading.RLock()
+        blank._reset()
+        return blank
+
+    def _swap(self, fresh):
+        with self._lock:
+            for name in self._STATE:
+                setattr(self, name, getattr(fresh, name))
+            self.version += 1
+
+    def _initial_load(self):
+        self._rebuild()
+
+    def _rebuild(self):
+        """
+        Full load into a blank gallery, then swap it in. Queries keep using
+        the current index meanwhile. Call with `_rebuild_lock` held.
+        """
+        fresh = self._blank()
+        fresh.loaded_at = time.time()
+        # read first: changes made while loading are caught next refresh
+        fresh.status_watermark = embedding_loader.latest_status_change(self.status_model)
+        fresh._load_new()
+        self._rebuilt(fresh)
+        self._swap(fresh)
+
+    def _rebuilt(self, fresh):
+        """
+        Called with every freshly built gallery before it is swapped in.
+        """
+
+    def _start_rebuild(self):
+        if not self._rebuild_lock.acquire(blocking=False):
+            return   # already rebuilding
+
+        def run():
+            try:
+                self._rebuild()
+            except Exception:
+                # loaded_at is unchanged, so the next refresh retries
+                traceback.print_exc()
+            finally:
+                self._rebuild_lock.release()
+
+        threading.Thread(target=run, name="gallery-rebuild", daemon=True).start()
+
+    # ---------------- INCREMENTAL ---------------- #
+
+    def _load_new(self):
+        since = None
+        if self.watermark is not None:
+            since = self.watermark - WATERMARK_OVERLAP
+
+        ids, matrix, latest = embedding_loader.load_embeddings(
+            self.model, self.status, since=since
+        )
+
+        if latest is not None and (self.watermark is None or latest > self.watermark):
+            self.watermark = latest
+
+        new = np.fromiter((row_id not in self._store for row_id in ids), bool, len(ids))
+        if new.any():
+            self.add(*embeddings.l2_normalize_rows(ids[new].tolist(), matrix[new]))
+
+    def _drop_resolved(self):
+        """
+        Remove cached rows whose status changed away from `self.status`
+        since the last check. Status flips back are left to the full reload.
+        """
+        if not len(self._store):
+            return
+
+        model = self.status_model
+        query = select(model.id, model.status_changed_on).where(model.status != self.status)
+        if self.status_watermark is None:
+            query = query.where(model.status_changed_on.is_not(None))
+        else:
+            query = query.where(
+                model.status_changed_on >= self.status_watermark - WATERMARK_OVERLAP
+            )
+
+        with Session(engine) as session:
+            rows = session.exec(query).all()
+
+        for _, changed_on in rows:
+            if self.status_watermark is None or changed_on > self.status_watermark:
+                self.status_watermark = changed_on
+
+        self.remove(self._rows_of([row_id for row_id, _ in rows]))
+
+    def _rows_of(self, status_ids):
+        """
+        Gallery ids belonging to these `status_model` ids.
+        """
+        return status_ids
+
+    # ---------------- MUTATE ---------------- #
+
+    def add(self, ids, vectors):
+        """
+        Add already-normalized vectors.
+        """
+        with self._lock:
+            if not len(ids):
+                return
+            self._store.add(ids, vectors)
+            if self.index is not self._store:
+                self.index.add(ids, vectors)
+            self.version += 1
+
+    def remove(self, ids):
+        with self._lock:
+            ids = [row_id for row_id in ids if row_id in self._store]
+            if not ids:
+                return
+            self._store.remove(ids)
+            if self.index is not self._store:
+                self.index.remove(ids)
+            self.version += 1
+
+
+# ---------------- PERSISTED GALLERY ---------------- #
+
+class PersistentGallery(EmbeddingGallery):
+    """
+    EmbeddingGallery kept on disk at `artifact_path`: the first refresh
+    restores it (with its ANN index) instead of reading every row, and
+    every full rebuild writes the artifact back.
+    """
+
+    def __init__(self, model, artifact_path, status="NF", index_kind=None):
+        super().__init__(model, status, index_kind)
+        self.artifact_path = artifact_path
+
+    def _initial_load(self):
+        if os.path.isfile(self.artifact_path):
+            try:
+                fresh = self._blank()
+                fresh.restore(self.artifact_path)
+                self._swap(fresh)
+                return
+            except Exception:
+                # unreadable artifact: rebuilt from the database
+                traceback.print_exc()
+        self._rebuild()
+
+    def _rebuilt(self, fresh):
+        try:
+            os.makedirs(os.path.dirname(self.artifact_path), exist_ok=True)
+            fresh.save(self.artifact_path)
+        except Exception:
+            traceback.print_exc()
+
+    # ---------------- PERSISTENCE ---------------- #
+
+    def save(self, path):
+        """
+        Write ids, normalized vectors, watermarks and the ANN index (if
+        any) to disk. The .npz is written to a temporary file and renamed
+        last, and names the index file of the same generation, so readers
+        never see a partial artifact and concurrent writers can't
+        interleave.
+        """
+        generation = f"{os.getpid()}.{threading.get_ident()}.{time.time_ns()}"
+
+        with self._lock:
+            index_path = ""
+            if self.index is not self._store:
+                index_path = f"{path}.{generation}.{self.index.kind}"
+                self.index.save(index_path)
+
+            state = {
+                "ids": np.asarray(self._store.ids, dtype=str),
+                "vectors": self._store.vectors,
+                "watermark": np.asarray(
+                    self.watermark.isoformat() if self.watermark else ""
+                ),
+                "status_watermark": np.asarray(
+                    self.status_watermark.isoformat() if self.status_watermark else ""
+                ),
+                "index_kind": np.asarray(self.index.kind),
+                "index_path": np.asarray(os.path.basename(index_path)),
+            }
+
+        tmp_path = f"{path}.{generation}.tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                np.savez(file, **state)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        # index files of older generations
+        for old_path in glob.glob(f"{glob.escape(path)}.*"):
+            if index_path and not old_path.startswith(index_path) and not old_path.endswith(".tmp"):
+                try:
+                    os.remove(old_path)
+                except OSError:   # still open elsewhere (Windows)
+                    pass
+
+    def restore(self, path):
+        """
+        Load a gallery written by `save()`; the next `refresh()` then only
+        fetches what changed since. The saved ANN index is reused when it
+        is of this gallery's kind, otherwise rebuilt from the vectors.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            ids = data["ids"].tolist()
+            vectors = data["vectors"]
+            watermark = str(data["watermark"])
+            status_watermark = str(data["status_watermark"])
+            index_kind = str(data["index_kind"])
+            index_name = str(data["index_path"])
+
+        with self._lock:
+            self._reset()
+            self._store.add(ids, vectors)
+
+            if self.index is not self._store:
+                index = None
+                if index_name and index_kind == self.index.kind:
+                    index_path = os.path.join(os.path.dirname(path), index_name)
+                    try:
+                        index = vector_index.load_index(index_path, index_kind)
+                    except Exception:
+                        # e.g. removed by a newer generation's save()
+                        traceback.print_exc()
+                if index is not None and len(index) == len(ids):
+                    self.index = index
+                else:
+                    self.index.add(ids, vectors)
+
+            self.watermark = datetime.fromisoformat(watermark) if watermark else None
+            self.status_watermark = (
+                datetime.fromisoformat(status_watermark) if status_watermark else None
+            )
+            # the watermarks bring it up to date on the next refresh, so
+            # the hourly rebuild counts from now, not from the save
+            self.loaded_at = time.time()
+            self.version += 1
+
+
+# ---------------- SUBMISSION FACES ---------------- #
+
+class FaceGallery(EmbeddingGallery):
+    """
+    Every stored face of the NF public submissions, one vector per
+    SubmissionFaces row, so a person in a group photo can be found.
+    `public_ids()` maps face ids back to their submission.
+    Rebuilt from the database on start, it is not persisted.
+    """
+
+    _STATE = EmbeddingGallery._STATE + ("owners", "faces")
+
+    def __init__(self, status="NF", index_kind=None):
+        super().__init__(SubmissionFaces, status, index_kind)
+        self.status_model = PublicSubmissions
+
+    def _reset(self):
+        super()._reset()
+        self.owners = {}   # face id -> public_case_id
+        self.faces = {}    # public_case_id -> face ids
+
+    def public_ids(self, face_ids):
+        """
+        Returns:
+            list of public_case_id, one per face id; None for faces
+            removed in the meantime
+        """
+        with self._lock:
+            return [self.owners.get(face_id) for face_id in face_ids]
+
+    def face_snapshot(self):
+        """
+        Returns:
+            (face_ids, public_ids, vectors) - like snapshot(), plus the
+            submission of every face
+        """
+        with self._lock:
+            face_ids, vectors = self.snapshot()
+            return face_ids, self.public_ids(face_ids), vectors
+
+    def _load_new(self):
+        since = None
+        if self.watermark is not None:
+            since = self.watermark - WATERMARK_OVERLAP
+
+        face_ids, public_ids, matrix, latest = embedding_loader.load_face_embeddings(
+            self.status, since=since
+        )
+
+        if latest is not None and (self.watermark is None or latest > self.watermark):
+            self.watermark = latest
+
+        new = np.fromiter((face_id not in self._store for face_id in face_ids), bool, len(face_ids))
+        if new.any():
+            owners = dict(zip(face_ids[new].tolist(), public_ids[new].tolist()))
+            ids, vectors = embeddings.l2_normalize_rows(face_ids[new].tolist(), matrix[new])
+            for face_id in ids:
+                self.owners[face_id] = owners[face_id]
+                self.faces.setdefault(owners[face_id], []).append(face_id)
+            self.add(ids, vectors)
+
+    def _rows_of(self, status_ids):
+        with self._lock:
+            return [face_id for pub_id in status_ids for face_id in self.faces.get(pub_id, ())]
+
+    def remove(self, ids):
+        with self._lock:
+            super().remove(ids)
+            for face_id in ids:
+                pub_id = self.owners.pop(face_id, None)
+                if pub_id is None:
+                    continue
+                faces = self.faces[pub_id]
+                faces.remove(face_id)
+                if not faces:
+                    del self.faces[pub_id]
+
+
+# ---------------- PROCESS-WIDE GALLERIES ---------------- #
+
+# Matching queries the registered side, so only it carries an ANN index.
+registered_gallery = PersistentGallery(
+    RegisteredCases,
+    os.path.join(GALLERY_DIR, f"registeredcases-nf.v{GALLERY_FORMAT}.npz"),
+    index_kind=vector_index.DEFAULT_INDEX_KIND,
+)
+public_faces = FaceGallery()
+
+_warm_up_started = False
+_warm_up_lock = threading.Lock()
+
+
+def warm_up():
+    """
+    Load both galleries (restoring the registered one from its artifact
+    when there is one), so the first upload does not pay for it.
+    """
+    for gallery in (registered_gallery, public_faces):
+        try:
+            gallery.refresh()
+        except Exception:
+            traceback.print_exc()
+
+
+def start_warm_up():
+    """
+    Warm the galleries up in a background thread, once per process.
+    """
+    global _warm_up_started
+
+    with _warm_up_lock:
+        if _warm_up_started:
+            return
+        _warm_up_started = True
+
+    threading.Thread(target=warm_up, daemon=True).start()
@@ -1,48 +1,12 @@
-import json
+import logging
 import traceback
 from collections import defaultdict
 
 import numpy as np
-import pandas as pd
-from sklearn.metrics.pairwise import cosine_similarity
 
-from helper import db_queries
-from helper.data_models import RegisteredCases
-from helper.db_queries import engine
-from sqlmodel import Session, select
+from helper import db_queries, gallery_cache, vector_index
 
-
-# ---------------- LOAD DATA ---------------- #
-
-def get_public_cases_data(status="NF"):
-    try:
-        result = db_queries.fetch_public_cases(train_data=True, status=status)
-        df = pd.DataFrame(result, columns=["id", "face_mesh"])
-        df["face_mesh"] = df["face_mesh"].apply(json.loads)
-        return df
-    except Exception:
-        traceback.print_exc()
-        return None
-
-
-def get_registered_cases_data(status="NF"):
-    try:
-        with Session(engine) as session:
-            result = session.exec(
-                select(
-                    RegisteredCases.id,
-                    RegisteredCases.face_mesh,
-                    RegisteredCases.status,
-                )
-            ).all()
-
-        df = pd.DataFrame(result, columns=["id", "face_mesh", "status"])
-        df = df[df["status"] == status]
-        df["face_mesh"] = df["face_mesh"].apply(json.loads)
-        return df
-    except Exception:
-        traceback.print_exc()
-        return None
+logger = logging.getLogger(__name__)
 
 
 # ---------------- UTILITIES ---------------- #
@@ -62,72 +26,177 @@ def l2_normalize(vec):
         return None
 
 
-# ---------------- CORE MATCHING ---------------- #
+# Realistic thresholds:
+#     0.75+ → FaceID / Banking
+#     0.60+ → Corporate
+#     0.45–0.55 → Police / Missing persons (YOU)
+SIMILARITY_THRESHOLD = 0.50
+
+
+# ---------------- PHOTO LOOKUP ---------------- #
 
-def match(similarity_threshold=0.50):
+# Faces fetched per wanted submission: several faces of one group
+# photo can crowd the top k.
+FACES_PER_RESULT = 2
+
+
+def find_similar_public(embedding, k=5):
     """
-    Realistic thresholds:
-        0.75+ → FaceID / Banking
-        0.60+ → Corporate
-        0.45–0.55 → Police / Missing persons (YOU)
+    Closest NF public submissions for one face embedding. Every face of
+    a group photo is searched; a submission scores by its closest face.
+
+    Returns:
+        list of (public_case_id, score), best first
     """
+    emb = l2_normalize(embedding)
+    if emb is None:
+        return []
 
-    matched_images = defaultdict(list)
+    faces = gallery_cache.public_faces.refresh()
+    face_ids, scores = faces.query(emb, k=k * FACES_PER_RESULT)
 
-    public_df = get_public_cases_data(status="NF")
-    reg_df = get_registered_cases_data(status="NF")
+    best = {}
+    for pub_id, score in zip(faces.public_ids(face_ids[0]), scores[0].tolist()):
+        if pub_id is not None:
+            best.setdefault(pub_id, score)   # results are sorted best-first
+    return list(best.items())[:k]
 
-    if public_df is None or reg_df is None:
-        return {"status": False, "message": "Database error"}
 
-    if len(public_df) == 0 or len(reg_df) == 0:
-        return {"status": False, "message": "No comparable cases"}
+# Each public submission keeps its best few registered cases as
+# candidates, so the officer can pick when two are close.
+MATCH_TOP_K = 3
 
-    # ---------------- NORMALIZE ---------------- #
 
-    reg_vectors = []
-    reg_ids = []
+# ---------------- INCREMENTAL MATCHING ---------------- #
 
-    for _, row in reg_df.iterrows():
-        emb = l2_normalize(row["face_mesh"])
-        if emb is not None and emb.shape[0] == 512:
-            reg_vectors.append(emb)
-            reg_ids.append(row["id"])
+def match_new_public_case(public_case_id, face_embeddings,
+                          similarity_threshold=SIMILARITY_THRESHOLD):
+    """
+    Score every face of one new public submission against the registered
+    gallery and record the close ones as candidates for review.
+    Called right after the row is saved, so the cost does not grow
+    with the number of public submissions.
 
-    pub_vectors = []
-    pub_ids = []
+    Args:
+        face_embeddings: one embedding per face in the photo
 
-    for _, row in public_df.iterrows():
-        emb = l2_normalize(row["face_mesh"])
-        if emb is not None and emb.shape[0] == 512:
-            pub_vectors.append(emb)
-            pub_ids.append(row["id"])
+    Returns:
+        dict - {"status": bool, "result": {registered_case_id: [public_case_id]}}
+    """
+    vectors = [vec for vec in map(l2_normalize, face_embeddings) if vec is not None]
+    if not vectors:
+        return _record([], similarity_threshold)
 
-    if not reg_vectors or not pub_vectors:
-        return {"status": False, "message": "No valid embeddings"}
+    # one refresh and one batched query for all the faces of the photo
+    registered = gallery_cache.registered_gallery.refresh()
+    best_ids, best_scores = registered.query(np.stack(vectors), k=MATCH_TOP_K)
 
-    reg_vectors = np.vstack(reg_vectors)
-    pub_vectors = np.vstack(pub_vectors)
+    scored = [
+        (reg_id, public_case_id, score)
+        for reg_row, score_row in zip(best_ids, best_scores)
+        for reg_id, score in zip(reg_row, score_row.tolist())
+    ]
+    return _record(scored, similarity_threshold)
 
-    # ---------------- SIMILARITY ---------------- #
 
-    similarity_matrix = cosine_similarity(pub_vectors, reg_vectors)
+def match_new_registered_case(registered_case_id, embedding,
+                              similarity_threshold=SIMILARITY_THRESHOLD):
+    """
+    Score one new registered case against the public gallery.
+
+    Returns:
+        dict - {"status": bool, "result": {registered_case_id: [public_case_id]}}
+    """
+    candidates = find_similar_public(embedding, k=MATCH_TOP_K)
+    return _record(
+        [(registered_case_id, pub_id, score) for pub_id, score in candidates],
+        similarity_threshold,
+    )
 
-    for i, pub_id in enumerate(pub_ids):
-        best_idx = int(np.argmax(similarity_matrix[i]))
-        best_score = float(similarity_matrix[i][best_idx])
-        reg_id = reg_ids[best_idx]
 
-        print(f"Similarity {pub_id} → {reg_id}: {best_score:.3f}")
+def _record(scored, similarity_threshold, run_id=None):
+    matched_images = defaultdict(list)
 
-        if best_score >= similarity_threshold:
-            matched_images[reg_id].append(pub_id)
+    accepted = []
+    for reg_id, pub_id, score in scored:
+        logger.debug("Similarity %s → %s: %.3f", pub_id, reg_id, score)
+        if score >= similarity_threshold:
+            accepted.append((reg_id, pub_id, score))
 
-            # Atomic DB update
-            db_queries.link_cases(reg_id, pub_id)
+    for reg_id, pub_id, _ in db_queries.record_match_candidates(accepted, run_id):
+        matched_images[reg_id].append(pub_id)
 
     return {"status": True, "result": matched_images}
 
 
+# ---------------- CORE MATCHING ---------------- #
+
+def match(similarity_threshold=SIMILARITY_THRESHOLD, k=MATCH_TOP_K,
+          public_ids=None, run_id=None, registered=None, faces=None,
+          registered_ids=None):
+    """
+    Sweep every face of the NF public submissions against the registered
+    gallery and record new candidate pairs; a pair keeps the score of its
+    closest face. Usually run by match_worker.py.
+
+    Args:
+        public_ids: only score these submissions (None: all of them)
+        registered_ids: only score against these registered cases
+                        (None: all of them)
+        run_id: MatchRuns.id the candidates belong to
+        registered: an already refreshed registered gallery
+        faces: an already taken public_faces.face_snapshot(); both
+               default to refreshing the process-wide galleries
+
+    Returns:
+        dict - {
+            "status": bool
+            "result": {registered_case_id: [public_case_id]} - new candidates
+            "scored": int - number of public submissions queried
+        }
+    """
+
+    # Process-wide caches: only rows changed since the last call are read
+    try:
+        if registered is None:
+            registered = gallery_cache.registered_gallery.refresh()
+        if faces is None:
+            faces = gallery_cache.public_faces.refresh().face_snapshot()
+        _, pub_ids, face_vectors = faces
+    except Exception:
+        traceback.print_exc()
+        return {"status": False, "message": "Database error"}
+
+    if public_ids is not None:
+        wanted = set(public_ids)
+        rows = [pos for pos, pub_id in enumerate(pub_ids) if pub_id in wanted]
+        pub_ids, face_vectors = [pub_ids[pos] for pos in rows], face_vectors[rows]
+
+    if registered_ids is not None:
+        wanted = set(registered_ids)
+        reg_ids, reg_vectors = registered.snapshot()
+        rows = [pos for pos, reg_id in enumerate(reg_ids) if reg_id in wanted]
+        # exact search over the few wanted rows
+        registered = vector_index.BruteForceIndex()
+        registered.add([reg_ids[pos] for pos in rows], reg_vectors[rows])
+
+    if len(registered) == 0 or not pub_ids:
+        return {"status": False, "message": "No comparable cases"}
+
+    # ---------------- SIMILARITY ---------------- #
+
+    best_ids, best_scores = registered.query(face_vectors, k=min(k, len(registered)))
+
+    scored = [
+        (reg_id, pub_id, float(score))
+        for pub_id, reg_row, score_row in zip(pub_ids, best_ids, best_scores)
+        for reg_id, score in zip(reg_row, score_row)
+    ]
+
+    result = _record(scored, similarity_threshold, run_id)
+    result["scored"] = len(set(pub_ids))
+    return result
+
+
 if __name__ == "__main__":
     print(match())
@@ -0,0 +1,163 @@
+import os
+import threading
+
+import numpy as np
+
+try:
+    import streamlit as st
+except ImportError:   # batch jobs / workers run without Streamlit
+    st = None
+
+# ==============================
+# MODEL PROFILES
+# ==============================
+
+# All profiles use the buffalo_l recognizer, so embeddings stay
+# comparable with the ones already stored in the database.
+#
+#   quality - every buffalo_l module, fixed 640x640 detection
+#   fast    - detection + recognition only; large photos are downscaled
+#             to max_side and the detector input follows the image size
+#   gpu     - quality on CUDA, falling back to CPU
+#
+# Per-image latency and peak RSS, from bench_face_profiles.py (paste its
+# rows here with the CPU and the photos used):
+#
+#   profile   load s  p50 ms  p95 ms  mean ms  RSS MB  faces
+#   quality        -       -       -        -       -      -   not measured yet
+#   fast           -       -       -        -       -      -   not measured yet
+#
+# The default stays "quality" until this table holds measured numbers
+# for "fast"; set FACE_MODEL_PROFILE to opt in.
+MODEL_PROFILES = {
+    "quality": {
+        "name": "buffalo_l",
+        "providers": ["CPUExecutionProvider"],
+        "allowed_modules": None,   # every buffalo_l module
+        "det_size": (640, 640),
+        "adaptive_det_size": False,
+        "max_side": None,
+    },
+    "fast": {
+        "name": "buffalo_l",
+        "providers": ["CPUExecutionProvider"],
+        "allowed_modules": ["detection", "recognition"],
+        "det_size": (640, 640),    # upper bound when adaptive
+        "adaptive_det_size": True,
+        "max_side": 1280,
+    },
+    "gpu": {
+        "name": "buffalo_l",
+        "providers": ["CUDAExecutionProvider", "CPUExecutionProvider"],
+        "allowed_modules": None,
+        "det_size": (640, 640),
+        "adaptive_det_size": False,
+        "max_side": None,
+    },
+}
+
+DEFAULT_PROFILE = os.getenv("FACE_MODEL_PROFILE", "quality")
+
+_models = {}
+_lock = threading.Lock()
+
+
+# ==============================
+# LAZY LOADING
+# ==============================
+
+def _build_face_app(profile: str, threads=None):
+    # Imported here so that importing this module stays cheap
+    from insightface.app import FaceAnalysis
+
+    config = MODEL_PROFILES[profile]
+    app = FaceAnalysis(
+        name=config["name"],
+        providers=config["providers"],
+        allowed_modules=config["allowed_modules"],
+    )
+    if threads:
+        _limit_threads(app, threads)
+    app.prepare(ctx_id=0, det_size=config["det_size"])
+    return app
+
+
+def _limit_threads(app, threads: int):
+    """
+    insightface does not forward SessionOptions to ONNX Runtime, so
+    rebuild each model's session with a capped thread pool. Used when
+    several worker processes share one machine.
+    """
+    import onnxruntime
+
+    sess_options = onnxruntime.SessionOptions()
+    sess_options.intra_op_num_threads = threads
+    sess_options.inter_op_num_threads = 1
+
+    for model in app.models.values():
+        model.session = onnxruntime.InferenceSession(
+            model.model_file,
+            sess_options=sess_options,
+            providers=model.session.get_providers(),
+        )
+
+
+def load_face_app(profile: str = DEFAULT_PROFILE, threads=None):
+    """
+    Process-wide FaceAnalysis for `profile`, built on first use.
+    Does not need Streamlit, so workers and scripts can use it too.
+
+    threads: ONNX Runtime intra-op threads (default: all cores).
+    """
+    if profile not in MODEL_PROFILES:
+        raise ValueError(f"Unknown model profile: {profile}")
+
+    key = (profile, threads)
+    with _lock:
+        if key not in _models:
+            _models[key] = _build_face_app(profile, threads)
+        return _models[key]
+
+
+if st is not None:
+    @st.cache_resource(show_spinner="Loading face model...")
+    def get_face_app(profile: str = DEFAULT_PROFILE):
+        """
+        Shared handle for every session and page of this Streamlit server.
+        """
+        return load_face_app(profile)
+else:
+    get_face_app = load_face_app
+
+
+# ==============================
+# WARM-UP
+# ==============================
+
+_warm_up_started = set()
+
+
+def warm_up(profile: str = DEFAULT_PROFILE):
+    """
+    Load the model and run one dummy inference so that ONNX Runtime
+    allocates its buffers before the first real upload.
+    """
+    app = load_face_app(profile)
+    app.get(np.zeros((*MODEL_PROFILES[profile]["det_size"], 3), dtype=np.uint8))
+    return app
+
+
+def start_warm_up(profile: str = DEFAULT_PROFILE):
+    """
+    Warm the model up in a background thread, once per process.
+    Enabled with FACE_MODEL_WARMUP=1.
+    """
+    if os.getenv("FACE_MODEL_WARMUP", "0") != "1":
+        return
+
+    with _lock:
+        if profile in _warm_up_started:
+            return
+        _warm_up_started.add(profile)
+
+    threading.Thread(target=warm_up, args=(profile,), daemon=True).start()
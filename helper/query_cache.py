@@ -0,0 +1,162 @@
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# ==============================
+# QUERY RESULT CACHE
+# ==============================
+
+# Streamlit reruns every page script on each interaction, so the same
+# list and dashboard reads repeat many times a minute while nothing
+# changes. Read functions in db_queries are wrapped with @cached_query:
+# results are shared by every session of this process, kept for a few
+# seconds, and dropped as soon as this process writes to a table they
+# read. Writes from the other app (another process) show up after the TTL.
+#
+# Cached results are shared between sessions: treat them as read-only.
+
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "30"))   # seconds
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "1024"))
+
+
+class QueryCache:
+    """
+    Thread-safe LRU + TTL cache. Every entry is tagged with the tables it
+    read and, for per-officer queries, the owner it was filtered by.
+    """
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> (expires, value, tags)
+        self._tags = {}                 # (table, owner | None) -> set of keys
+        self._generations = {}          # table -> invalidation count
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_or_compute(self, key, tags, compute):
+        """
+        Args:
+            tags: list of (table, owner) pairs; owner None means the
+                  query is not limited to one owner
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+            generations = [self._generations.get(table, 0) for table, _ in tags]
+
+        # computed outside the lock: a slow query must not block hits
+        value = compute()
+
+        with self._lock:
+            # a write landed while computing: the value may be stale
+            if generations != [self._generations.get(table, 0) for table, _ in tags]:
+                return value
+
+            self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+        return value
+
+    def invalidate(self, table, owner=None):
+        """
+        Drops cached reads of `table`: all of them, or, with `owner`, the
+        ones filtered by that owner plus the ones not filtered by owner.
+        """
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+
+            if owner is None:
+                tags = [tag for tag in self._tags if tag[0] == table]
+            else:
+                tags = [(table, None), (table, owner)]
+
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            for table in {table for table, _ in self._tags}:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+query_cache = QueryCache(QUERY_CACHE_TTL, QUERY_CACHE_MAX_ENTRIES)
+
+
+# ==============================
+# DECORATOR + INVALIDATION
+# ==============================
+
+def cached_query(*tables, owner=None):
+    """
+    Caches a read function's result, keyed on its name and arguments.
+
+    Args:
+        tables: table names the query reads
+        owner: name of the argument holding the officer the query is
+               filtered by (e.g. "submitted_by"); writes by other
+               officers then leave the entry alone
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = tuple(bound.arguments.items())
+
+            owner_value = bound.arguments.get(owner) if owner else None
+            tags = [(table, owner_value) for table in tables]
+
+            return query_cache.get_or_compute(
+                (func.__qualname__, params),
+                tags,
+                lambda: func(*args, **kwargs),
+            )
+
+        wrapper.uncached = func
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*tables, owners=None):
+    """
+    Call after committing a write.
+
+    Args:
+        owners: officers whose rows changed, when known; None drops
+                every cached read of the tables
+    """
+    for table in tables:
+        if owners is None:
+            query_cache.invalidate(table)
+        else:
+            for owner in owners:
+                query_cache.invalidate(table, owner)
@@ -0,0 +1,109 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image, features
+
+from helper.storage import get_storage
+
+# ==============================
+# IMAGE RENDITIONS
+# ==============================
+
+# Case lists show photos at 150-300 px, so they load a small thumbnail
+# instead of the full-size original. The medium rendition is for
+# detail views. Both are made once, at upload time.
+
+RENDITIONS = {
+    "thumbnail_path": 320,   # longest side in px; 2x the list width
+    "medium_path": 960,
+}
+
+RENDITION_QUALITY = 80
+
+# Pillow builds without libwebp fall back to JPEG
+if features.check("webp"):
+    RENDITION_FORMAT, RENDITION_EXT, RENDITION_TYPE = "WEBP", "webp", "image/webp"
+else:
+    RENDITION_FORMAT, RENDITION_EXT, RENDITION_TYPE = "JPEG", "jpg", "image/jpeg"
+
+
+def encode_rendition(image_rgb: np.ndarray, max_side: int) -> bytes:
+    """
+    Downscale (never upscale) so the longest side is at most `max_side`.
+
+    Returns:
+        bytes - encoded WebP (or JPEG)
+    """
+    image = Image.fromarray(np.ascontiguousarray(image_rgb)).convert("RGB")
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, RENDITION_FORMAT, quality=RENDITION_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def rendition_name(original_name: str, field: str) -> str:
+    """
+    Object name next to the original, e.g. <uuid>_thumbnail.webp
+    """
+    stem = os.path.splitext(original_name)[0]
+    return f"{stem}_{field.replace('_path', '')}.{RENDITION_EXT}"
+
+
+def _encode_and_upload(image_rgb, max_side, object_name):
+    return get_storage().upload(
+        encode_rendition(image_rgb, max_side),
+        object_name,
+        RENDITION_TYPE,
+        object_name,
+    )
+
+
+def upload_renditions_async(image_rgb: np.ndarray, original_name: str):
+    """
+    Encode and upload every rendition on the storage pool. `original_name`
+    is the storage object name of the original, which need not be
+    uploaded yet.
+
+    Returns:
+        dict - field name -> Future resolving to the rendition URL
+    """
+    pool = get_storage().pool
+    return {
+        field: pool.submit(
+            _encode_and_upload, image_rgb, max_side, rendition_name(original_name, field)
+        )
+        for field, max_side in RENDITIONS.items()
+    }
+
+
+def collect_renditions(futures):
+    """
+    Returns:
+        dict - field name -> URL, None where the upload failed
+        (pages then fall back to the original image)
+    """
+    urls = {}
+    for field, future in futures.items():
+        try:
+            urls[field] = future.result()
+        except Exception as e:
+            print(f"Rendition upload error ({field}):", e)
+            urls[field] = None
+    return urls
+
+
+def create_renditions(image_rgb: np.ndarray, original_name: str):
+    """
+    Returns:
+        dict - {"thumbnail_path": str | None, "medium_path": str | None}
+    """
+    return collect_renditions(upload_renditions_async(image_rgb, original_name))
+
+
+def delete_renditions(urls):
+    storage = get_storage()
+    for url in urls.values():
+        if url:
+            storage.delete(url)
@@ -0,0 +1,85 @@
+import numpy as np
+
+# Peak scratch memory per tile is QUERY_TILE * GALLERY_TILE * 4 bytes
+# (64 MB with the defaults), independent of the gallery sizes.
+QUERY_TILE = 1024
+GALLERY_TILE = 16384
+
+
+# ---------------- TILED TOP-K ---------------- #
+
+def topk_similarity(queries, gallery, k=1, query_tile=QUERY_TILE,
+                    gallery_tile=GALLERY_TILE):
+    """
+    Exact top-k inner-product search without materializing the full
+    (Q, N) similarity matrix.
+
+    Walks the queries and the gallery in tiles, keeps a running top-k
+    per query row with argpartition and merges each tile into it.
+    Inputs are expected to be L2-normalized, so scores are cosines.
+
+    Args:
+        queries: (Q, D) float32
+        gallery: (N, D) float32
+        k: int - clipped to N
+
+    Returns:
+        (positions, scores, ranks) - (Q, k) arrays sorted best-first.
+        positions index into `gallery`; ranks start at 1.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    gallery = np.asarray(gallery, dtype=np.float32)
+
+    n_queries, n_gallery = len(queries), len(gallery)
+    k = min(k, n_gallery)
+
+    positions = np.empty((n_queries, k), dtype=np.int64)
+    scores = np.empty((n_queries, k), dtype=np.float32)
+
+    if k == 0:
+        return positions, scores, np.empty((n_queries, 0), dtype=np.int64)
+
+    for q_start in range(0, n_queries, query_tile):
+        q_block = queries[q_start : q_start + query_tile]
+
+        best_pos = np.full((len(q_block), k), -1, dtype=np.int64)
+        best_scores = np.full((len(q_block), k), -np.inf, dtype=np.float32)
+
+        for g_start in range(0, n_gallery, gallery_tile):
+            tile = q_block @ gallery[g_start : g_start + gallery_tile].T
+            tile_pos, tile_scores = _topk(tile, k)
+
+            best_pos, best_scores = _topk_merge(
+                best_pos, best_scores, tile_pos + g_start, tile_scores, k
+            )
+
+        order = np.argsort(-best_scores, axis=1, kind="stable")
+        positions[q_start : q_start + len(q_block)] = np.take_along_axis(
+            best_pos, order, axis=1
+        )
+        scores[q_start : q_start + len(q_block)] = np.take_along_axis(
+            best_scores, order, axis=1
+        )
+
+    ranks = np.broadcast_to(np.arange(1, k + 1), (n_queries, k))
+    return positions, scores, ranks
+
+
+def _topk(scores, k):
+    """
+    Unordered top-k columns of each row.
+    """
+    if scores.shape[1] <= k:
+        pos = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        return pos, scores
+
+    pos = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return pos, np.take_along_axis(scores, pos, axis=1)
+
+
+def _topk_merge(pos_a, scores_a, pos_b, scores_b, k):
+    pos = np.concatenate([pos_a, pos_b], axis=1)
+    scores = np.concatenate([scores_a, scores_b], axis=1)
+
+    keep, top_scores = _topk(scores, k)
+    return np.take_along_axis(pos, keep, axis=1), top_scores
@@ -0,0 +1,222 @@
+import mimetypes
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# -------------------------------------
+# SETTINGS
+# -------------------------------------
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+UPLOAD_RETRIES = 3
+RETRY_BASE_DELAY = 0.5   # seconds, doubled on every attempt
+UPLOAD_THREADS = int(os.getenv("STORAGE_UPLOAD_THREADS", "8"))
+
+
+def get_setting(name, default=None):
+    """
+    Streamlit secrets first, then environment variables
+    (same lookup order as the database and Supabase credentials).
+    """
+    try:
+        import streamlit as st
+
+        if name in st.secrets:
+            return st.secrets[name]
+    except Exception:   # no Streamlit or no secrets file
+        pass
+    return os.getenv(name, default)
+
+
+def with_retries(func, *args, attempts=UPLOAD_RETRIES, base_delay=RETRY_BASE_DELAY):
+    """
+    Call func(*args), retrying with exponential backoff and jitter.
+    Re-raises the last error.
+    """
+    for attempt in range(attempts):
+        try:
+            return func(*args)
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = base_delay * 2 ** attempt * (1 + random.random())
+            print(f"Storage error ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+# -------------------------------------
+# BACKEND INTERFACE
+# -------------------------------------
+
+class StorageBackend:
+    """
+    Stores case images and returns a URL (or path) that st.image can show.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    # -- implemented by backends --
+
+    def _put(self, object_name: str, data: bytes, content_type: str):
+        raise NotImplementedError
+
+    def _remove(self, object_name: str):
+        raise NotImplementedError
+
+    def public_url(self, object_name: str) -> str:
+        raise NotImplementedError
+
+    def object_name(self, public_url: str) -> str:
+        return public_url.split("?")[0].rstrip("/").split("/")[-1]
+
+    # -- shared behaviour --
+
+    @staticmethod
+    def new_object_name(filename: str) -> str:
+        file_ext = filename.split(".")[-1].lower() if "." in filename else "jpg"
+        return f"{uuid.uuid4()}.{file_ext}"
+
+    def upload(self, data: bytes, filename: str, content_type=None, object_name=None):
+        """
+        Store `data` under a new unique name (or `object_name`).
+        Retries with backoff; raises if every attempt fails.
+
+        Returns:
+            str - public URL
+        """
+        object_name = object_name or self.new_object_name(filename)
+        content_type = content_type or mimetypes.guess_type(filename)[0] or "image/jpeg"
+
+        with_retries(self._put, object_name, data, content_type)
+        return self.public_url(object_name)
+
+    def delete(self, public_url: str) -> bool:
+        try:
+            with_retries(self._remove, self.object_name(public_url))
+            return True
+        except Exception as e:
+            print("Delete error:", e)
+            return False
+
+    @property
+    def pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=UPLOAD_THREADS, thread_name_prefix="storage"
+                )
+            return self._pool
+
+    def upload_async(self, data: bytes, filename: str, content_type=None):
+        """
+        Returns:
+            Future resolving to the public URL
+        """
+        return self.pool.submit(self.upload, data, filename, content_type)
+
+    def upload_many(self, items):
+        """
+        Upload many (data, filename) pairs concurrently.
+
+        Returns:
+            list of public URLs in input order; None where an upload failed
+        """
+        futures = [self.upload_async(data, filename) for data, filename in items]
+
+        urls = []
+        for future in futures:
+            try:
+                urls.append(future.result())
+            except Exception as e:
+                print("Upload error:", e)
+                urls.append(None)
+        return urls
+
+
+# -------------------------------------
+# LOCAL FILESYSTEM BACKEND
+# -------------------------------------
+
+class LocalStorage(StorageBackend):
+    """
+    Writes images under `root`. With `base_url` set (e.g. a static file
+    server or reverse proxy in front of `root`), URLs are
+    base_url/<name>; otherwise the absolute file path is returned,
+    which st.image can read directly.
+    """
+
+    def __init__(self, root, base_url=None):
+        super().__init__()
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip("/") if base_url else None
+        os.makedirs(self.root, exist_ok=True)
+
+    def _put(self, object_name, data, content_type):
+        path = os.path.join(self.root, object_name)
+        tmp_path = f"{path}.part"
+        with open(tmp_path, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+
+    def _remove(self, object_name):
+        path = os.path.join(self.root, object_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def public_url(self, object_name):
+        if self.base_url:
+            return f"{self.base_url}/{object_name}"
+        return os.path.join(self.root, object_name)
+
+    def object_name(self, public_url):
+        return os.path.basename(public_url.split("?")[0])
+
+
+# -------------------------------------
+# BACKEND SELECTION
+# -------------------------------------
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_storage():
+    """
+    STORAGE_BACKEND = "supabase" | "local"
+    Defaults to Supabase when its credentials are configured, else local.
+    """
+    kind = get_setting("STORAGE_BACKEND")
+
+    if kind is None:
+        has_supabase = get_setting("SUPABASE_URL") and get_setting("SUPABASE_KEY")
+        kind = "supabase" if has_supabase else "local"
+
+    if kind == "supabase":
+        from helper.supabase_storage import SupabaseStorage
+
+        return SupabaseStorage()
+
+    if kind == "local":
+        return LocalStorage(
+            get_setting("STORAGE_LOCAL_DIR", os.path.join(BASE_DIR, "resources", "uploads")),
+            get_setting("STORAGE_BASE_URL"),
+        )
+
+    raise ValueError(f"Unknown STORAGE_BACKEND: {kind}")
+
+
+def get_storage() -> StorageBackend:
+    """
+    Process-wide storage backend, created on first use.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_storage()
+        return _backend
@@ -35,6 +35,73 @@ def show_warning(message: str):
     st.warning(message)
 
 
+# ---------------- CASE IMAGES ---------------- #
+
+def case_image_url(case, rendition="thumbnail_path"):
+    """
+    URL of a case photo rendition ("thumbnail_path" or "medium_path"),
+    falling back to the original for cases saved before renditions.
+    """
+    return getattr(case, rendition, None) or case.image_path
+
+
+def show_case_image(case, width=150, rendition="thumbnail_path", container=st):
+    """
+    Shows a stored case photo: a storage URL or a local file path.
+    """
+    show_image_path(case_image_url(case, rendition), width, container)
+
+
+def show_image_path(image_path, width=150, container=st):
+    if image_path and (
+        str(image_path).startswith("http") or os.path.isfile(image_path)
+    ):
+        try:
+            container.image(image_path, width=width)
+            return
+        except Exception:
+            pass
+    container.warning("Image not available")
+
+
+# ---------------- PAGINATION ---------------- #
+
+def paginate(key, fetch_page):
+    """
+    Keyset pagination across reruns. The cursors of the pages visited so
+    far are kept in st.session_state[key], so "Previous" needs no query
+    of its own to find where the earlier page started.
+
+    Args:
+        key: unique per list; include the filters so changing them
+             starts again from page 1
+        fetch_page: callable(cursor) -> (rows, next_cursor)
+
+    Returns:
+        rows of the current page; the Previous / Next row is drawn
+        where this is called
+    """
+    cursors = st.session_state.setdefault(key, [None])
+    rows, next_cursor = fetch_page(cursors[-1])
+
+    prev_col, page_col, next_col = st.columns([1, 2, 1])
+    prev_col.button(
+        "Previous",
+        key=f"{key}_prev",
+        disabled=len(cursors) == 1,
+        on_click=cursors.pop,
+    )
+    page_col.caption(f"Page {len(cursors)}")
+    next_col.button(
+        "Next",
+        key=f"{key}_next",
+        disabled=next_cursor is None,
+        on_click=cursors.append,
+        args=(next_cursor,),
+    )
+    return rows
+
+
 # ---------------- IMAGE CACHE (CRITICAL FIX) ---------------- #
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
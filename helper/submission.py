@@ -0,0 +1,109 @@
+import io
+import logging
+import time
+
+from helper import renditions
+from helper.storage import get_storage
+from helper.utils import image_obj_to_numpy, extract_faces
+
+logger = logging.getLogger(__name__)
+
+# ==============================
+# SUBMISSION PIPELINE
+# ==============================
+
+# The storage upload is network-bound and face inference is CPU-bound,
+# so the upload starts first and runs while the model works. The user
+# waits for the slower of the two instead of their sum.
+
+def _timed_upload(file_bytes, filename, object_name):
+    started = time.perf_counter()
+    try:
+        image_path = get_storage().upload(file_bytes, filename, object_name=object_name)
+    except Exception as e:
+        print("Upload error:", e)
+        image_path = None
+    return image_path, time.perf_counter() - started
+
+
+def run_submission_pipeline(file_bytes: bytes, filename: str):
+    """
+    Decode + embed the image while it uploads in the background.
+    If no face is found the upload is cancelled, or the stored object
+    is deleted once the upload has finished. When a face is found the
+    thumbnail and medium renditions are uploaded alongside the original.
+    Every face in the photo is embedded; `embedding` is the most
+    confident one.
+
+    Returns:
+        dict - {
+            "image": RGB numpy array
+            "embedding": list[float] | None
+            "faces": list of {"embedding", "bbox", "det_score"}, see
+                     helper/utils.py extract_faces
+            "image_path": str | None - public URL, None without a face
+            "thumbnail_path": str | None - None when not available
+            "medium_path": str | None
+            "timings": {"decode", "inference", "upload", "total"} in seconds
+        }
+    """
+    started = time.perf_counter()
+    timings = {}
+
+    storage = get_storage()
+    object_name = storage.new_object_name(filename)
+    upload_future = storage.pool.submit(_timed_upload, file_bytes, filename, object_name)
+
+    try:
+        stage = time.perf_counter()
+        image = image_obj_to_numpy(io.BytesIO(file_bytes))
+        timings["decode"] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        faces = extract_faces(image)
+        timings["inference"] = time.perf_counter() - stage
+    except Exception:
+        # e.g. an unreadable image: don't leave the object behind
+        if not upload_future.cancel():
+            upload_future.add_done_callback(_discard_upload)
+        raise
+
+    embedding = faces[0]["embedding"].astype(float).tolist() if faces else None
+
+    image_path = None
+    rendition_urls = dict.fromkeys(renditions.RENDITIONS)
+    if embedding:
+        rendition_futures = renditions.upload_renditions_async(image, object_name)
+        image_path, timings["upload"] = upload_future.result()
+        rendition_urls = renditions.collect_renditions(rendition_futures)
+
+        if not image_path:
+            # no original to fall back to: the submission can't be saved
+            renditions.delete_renditions(rendition_urls)
+            rendition_urls = dict.fromkeys(renditions.RENDITIONS)
+    elif not upload_future.cancel():
+        # already uploading: remove the object in the background
+        upload_future.add_done_callback(_discard_upload)
+
+    timings["total"] = time.perf_counter() - started
+    logger.debug(
+        "Submission timings: %s",
+        ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items()),
+    )
+
+    return {
+        "image": image,
+        "embedding": embedding,
+        "faces": faces,
+        "image_path": image_path,
+        **rendition_urls,
+        "timings": timings,
+    }
+
+
+def _discard_upload(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    image_path, _ = future.result()
+    if image_path:
+        get_storage().delete(image_path)
@@ -1,7 +1,8 @@
 import os
-import uuid
+import threading
 import streamlit as st
-from supabase import create_client
+
+from helper.storage import StorageBackend, get_storage
 
 
 # -------------------------------------
@@ -26,11 +27,52 @@ def get_supabase_credentials():
     raise ValueError("Supabase credentials not found.")
 
 
-SUPABASE_URL, SUPABASE_KEY = get_supabase_credentials()
+BUCKET_NAME = "missing-person-images"
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 
-BUCKET_NAME = "missing-person-images"
+# -------------------------------------
+# SUPABASE BACKEND
+# -------------------------------------
+class SupabaseStorage(StorageBackend):
+    """
+    Supabase Storage bucket. The client is created on first use and then
+    reused; public URLs are built locally instead of one extra API call
+    per image.
+    """
+
+    def __init__(self, bucket=BUCKET_NAME):
+        super().__init__()
+        self.bucket = bucket
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._url = None
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if self._client is None:
+                from supabase import create_client   # only needed for this backend
+
+                self._url, key = get_supabase_credentials()
+                self._client = create_client(self._url, key)
+            return self._client
+
+    def _put(self, object_name, data, content_type):
+        # x-upsert: a retry after an attempt that landed but timed out on
+        # our side would otherwise fail with 409 Duplicate. storage3 sends
+        # file options as headers and defaults this one to "false".
+        self.client.storage.from_(self.bucket).upload(
+            object_name,
+            data,
+            {"content-type": content_type, "x-upsert": "true"},
+        )
+
+    def _remove(self, object_name):
+        self.client.storage.from_(self.bucket).remove([object_name])
+
+    def public_url(self, object_name):
+        self.client   # makes sure the project URL is known
+        return f"{self._url.rstrip('/')}/storage/v1/object/public/{self.bucket}/{object_name}"
 
 
 # -------------------------------------
@@ -38,7 +80,8 @@ BUCKET_NAME = "missing-person-images"
 # -------------------------------------
 def upload_image(file_or_bytes, original_filename=None):
     """
-    Flexible upload function.
+    Flexible upload function, kept for existing callers.
+    Goes through the configured backend (see helper/storage.py).
     Works with:
     1) upload_image(file_object)
     2) upload_image(file_bytes, filename)
@@ -48,34 +91,24 @@ def upload_image(file_or_bytes, original_filename=None):
         # Case 1: Streamlit file uploader object
         if original_filename is None:
             file_obj = file_or_bytes
-            file_bytes = file_obj.getvalue()
-            original_filename = file_obj.name
-            content_type = file_obj.type
-        else:
-            # Case 2: bytes + filename
-            file_bytes = file_or_bytes
-            content_type = "image/jpeg"
-
-        # Extract extension safely
-        file_ext = original_filename.split(".")[-1].lower()
-
-        # Generate unique filename
-        unique_filename = f"{uuid.uuid4()}.{file_ext}"
-
-        # Upload to Supabase storage
-        supabase.storage.from_(BUCKET_NAME).upload(
-            unique_filename,
-            file_bytes,
-            {"content-type": content_type},
-        )
+            return get_storage().upload(
+                file_obj.getvalue(), file_obj.name, file_obj.type
+            )
 
-        # Get public URL
-        public_url = supabase.storage.from_(BUCKET_NAME).get_public_url(
-            unique_filename
-        )
-
-        return public_url
+        # Case 2: bytes + filename
+        return get_storage().upload(file_or_bytes, original_filename)
 
     except Exception as e:
         print("Upload error:", e)
         return None
+
+
+# -------------------------------------
+# DELETE IMAGE FUNCTION
+# -------------------------------------
+def delete_image(public_url):
+    """
+    Removes an object uploaded by upload_image, given its public URL.
+    Returns True on success.
+    """
+    return get_storage().delete(public_url)
@@ -0,0 +1,118 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from helper.submission import run_submission_pipeline
+
+# ==============================
+# UPLOAD CACHE
+# ==============================
+
+# Streamlit reruns the page script on every widget interaction. Keying
+# the work on the SHA-256 of the uploaded bytes means one upload costs
+# exactly one inference and one storage write, however many reruns follow.
+
+UPLOAD_CACHE_MAX_BYTES = int(os.getenv("UPLOAD_CACHE_MAX_MB", "256")) * 1024 * 1024
+
+
+class LRUCache:
+    """
+    Thread-safe LRU cache bounded by the total size of its entries.
+    """
+
+    def __init__(self, max_bytes, sizeof):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self._lock:
+            if key in self._entries:
+                self.total_bytes -= self.sizeof(self._entries.pop(key))
+
+            self._entries[key] = entry
+            self.total_bytes += self.sizeof(entry)
+
+            # always keep the newest entry, even if it alone is too big
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= self.sizeof(evicted)
+
+
+def _entry_size(entry):
+    image = entry["image"]
+    faces = sum(face["embedding"].nbytes for face in entry.get("faces") or ())
+    return (image.nbytes if image is not None else 0) + faces + 4096
+
+
+_cache = LRUCache(UPLOAD_CACHE_MAX_BYTES, _entry_size)
+
+# one lock per digest being processed, so concurrent reruns of the same
+# upload wait for the first one instead of repeating the work
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+# ==============================
+# PUBLIC API
+# ==============================
+
+def sha256_digest(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def process_upload(file_bytes: bytes, filename: str):
+    """
+    Decode, embed and upload an image once per distinct content.
+
+    Returns:
+        dict - {
+            "sha256": str
+            "image": RGB numpy array
+            "embedding": list[float] | None - None when no face was found
+            "faces": every face found, see helper/submission.py
+            "image_path": str | None - public URL; only kept when a
+                          face was found
+            "thumbnail_path", "medium_path": str | None - see helper/renditions.py
+            "timings": per-stage seconds of the first run
+        }
+    """
+    digest = sha256_digest(file_bytes)
+
+    entry = _cache.get(digest)
+    if entry is not None:
+        return entry
+
+    with _in_flight_lock:
+        key_lock = _in_flight.setdefault(digest, threading.Lock())
+
+    with key_lock:
+        try:
+            entry = _cache.get(digest)
+            if entry is None:
+                entry = run_submission_pipeline(file_bytes, filename)
+                entry["sha256"] = digest
+
+                # a failed upload is retried on the next rerun
+                if entry["image_path"] or not entry["embedding"]:
+                    _cache.put(digest, entry)
+        finally:
+            # still holding key_lock: a rerun arriving now either waits
+            # on this lock or finds the entry in the cache
+            with _in_flight_lock:
+                _in_flight.pop(digest, None)
+
+    return entry
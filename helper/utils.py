@@ -3,7 +3,8 @@ import numpy as np
 import cv2
 import PIL
 import streamlit as st
-from insightface.app import FaceAnalysis
+
+from helper import face_batch, model_cache
 
 # ==============================
 # CENTRAL DATABASE PATH (FIX)
@@ -21,15 +22,11 @@ DB_PATH = os.path.join(DATA_DIR, "cases.db")
 
 
 # ==============================
-# FACE MODEL (LOAD ONCE)
+# FACE MODEL (LAZY, SHARED)
 # ==============================
 
-# Load InsightFace model once (global singleton)
-app = FaceAnalysis(
-    name="buffalo_l",
-    providers=["CPUExecutionProvider"]
-)
-app.prepare(ctx_id=0, det_size=(640, 640))
+# The InsightFace model is loaded on first use by helper/model_cache.py,
+# so importing this module no longer pays for it.
 
 
 # ==============================
@@ -45,24 +42,42 @@ def image_obj_to_numpy(image_obj) -> np.ndarray:
     return np.array(image)
 
 
-def extract_face_embedding(image_rgb: np.ndarray):
+def extract_faces(image_rgb: np.ndarray):
     """
-    Extract 512-D identity embedding using InsightFace.
+    Detect and embed the faces in the image in one detection pass; in
+    group photos, faces below face_batch.MIN_FACE_SIZE / MIN_DET_SCORE
+    are left out, the most confident one is always kept.
     Converts RGB → BGR internally (required by InsightFace).
+
+    Returns:
+        list of dicts - {"embedding": float32 (512,), "bbox": [x1, y1, x2, y2],
+                         "det_score": float}, most confident first;
+        empty when no face was found or extraction failed
     """
     try:
         # Convert RGB → BGR for model
         image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
 
-        faces = app.get(image_bgr)
-
-        if faces is None or len(faces) == 0:
-            st.error("No face detected. Please upload a clear face image.")
-            return None
-
-        embedding = faces[0].embedding  # (512,)
-        return embedding.astype(float).tolist()
+        return face_batch.faces_from_image(
+            model_cache.get_face_app(), image_bgr,
+            min_size=face_batch.MIN_FACE_SIZE, min_score=face_batch.MIN_DET_SCORE,
+        )
 
     except Exception as e:
         st.error(f"Face extraction failed: {str(e)}")
-        return None
\ No newline at end of file
+        return []
+
+
+def extract_face_embedding(image_rgb: np.ndarray):
+    """
+    Extract 512-D identity embedding using InsightFace.
+    Only the most confident face is used.
+    """
+    faces = extract_faces(image_rgb)
+
+    if not faces:
+        st.error("No face detected. Please upload a clear face image.")
+        return None
+
+    embedding = faces[0]["embedding"]  # (512,)
+    return embedding.astype(float).tolist()
@@ -0,0 +1,287 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+from helper import embeddings, similarity
+
+try:
+    import hnswlib
+except ImportError:   # optional, falls back to exact search
+    hnswlib = None
+
+# Vectors are expected to be L2-normalized, so inner product == cosine.
+
+DEFAULT_INDEX_KIND = os.getenv("VECTOR_INDEX", "auto")
+
+
+# ---------------- INTERFACE ---------------- #
+
+class VectorIndex:
+    """
+    Minimal id -> vector index used for the face galleries.
+
+    query() returns (ids, scores): a list of id lists and a (Q, k) float32
+    array, both sorted best-first. Rows may be shorter than k when the
+    index holds fewer than k vectors.
+    """
+
+    kind = None
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, row_id):
+        raise NotImplementedError
+
+    def add(self, ids, vectors):
+        raise NotImplementedError
+
+    def remove(self, ids):
+        raise NotImplementedError
+
+    def query(self, vectors, k=1):
+        raise NotImplementedError
+
+    def save(self, path):
+        raise NotImplementedError
+
+    @classmethod
+    def load(cls, path):
+        raise NotImplementedError
+
+
+# ---------------- EXACT ---------------- #
+
+class BruteForceIndex(VectorIndex):
+    """
+    Exact search over a dense float32 matrix.
+    Also the backing store for EmbeddingGallery snapshots.
+    """
+
+    kind = "brute"
+
+    def __init__(self, dim=embeddings.EMBEDDING_DIM):
+        self.dim = dim
+        self._ids = []
+        self._positions = {}
+        self._buffer = np.empty((0, dim), dtype=np.float32)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, row_id):
+        return row_id in self._positions
+
+    @property
+    def ids(self):
+        return self._ids
+
+    @property
+    def vectors(self):
+        """Read-only view of the live rows."""
+        view = self._buffer[: len(self._ids)]
+        view.flags.writeable = False
+        return view
+
+    def vector(self, row_id):
+        pos = self._positions.get(row_id)
+        return None if pos is None else self._buffer[pos].copy()
+
+    def add(self, ids, vectors):
+        """
+        Append vectors. Grows the buffer geometrically so appends are
+        amortized O(1) and never touch rows handed out in earlier views.
+        """
+        size = len(self._ids)
+        needed = size + len(ids)
+
+        if needed > self._buffer.shape[0]:
+            capacity = max(needed, 2 * self._buffer.shape[0], 64)
+            buffer = np.empty((capacity, self.dim), dtype=np.float32)
+            buffer[:size] = self._buffer[:size]
+            self._buffer = buffer
+
+        self._buffer[size:needed] = vectors
+        for offset, row_id in enumerate(ids):
+            self._positions[row_id] = size + offset
+        self._ids.extend(ids)
+
+    def remove(self, ids):
+        """
+        Drop rows by id. Writes a fresh buffer so earlier views are never
+        modified underneath the caller.
+        """
+        drop = {row_id for row_id in ids if row_id in self._positions}
+        if not drop:
+            return
+
+        keep = [pos for pos, row_id in enumerate(self._ids) if row_id not in drop]
+        self._buffer = self._buffer[keep]
+        self._ids = [self._ids[pos] for pos in keep]
+        self._positions = {row_id: pos for pos, row_id in enumerate(self._ids)}
+
+    def query(self, vectors, k=1):
+        # tiled, so memory stays bounded for large query batches
+        positions, scores, _ = similarity.topk_similarity(vectors, self.vectors, k)
+        ids = [[self._ids[pos] for pos in row] for row in positions.tolist()]
+        return ids, scores
+
+    def save(self, path):
+        path = path if path.endswith(".npz") else f"{path}.npz"
+        np.savez(path, ids=np.asarray(self._ids, dtype=str), vectors=self.vectors)
+
+    @classmethod
+    def load(cls, path):
+        path = path if path.endswith(".npz") else f"{path}.npz"
+        data = np.load(path)
+        index = cls(dim=data["vectors"].shape[1])
+        index.add(data["ids"].tolist(), data["vectors"])
+        return index
+
+
+# ---------------- APPROXIMATE (HNSW) ---------------- #
+
+class HNSWIndex(VectorIndex):
+    """
+    Approximate search with hnswlib (inner-product space).
+    Removed ids are mark-deleted and their slots reused by later adds.
+    """
+
+    kind = "hnsw"
+
+    def __init__(self, dim=embeddings.EMBEDDING_DIM, capacity=1024,
+                 m=16, ef_construction=200, ef_search=128):
+        if hnswlib is None:
+            raise ImportError("hnswlib is not installed")
+
+        self.dim = dim
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+
+        self._index = hnswlib.Index(space="ip", dim=dim)
+        self._index.init_index(
+            max_elements=capacity,
+            ef_construction=ef_construction,
+            M=m,
+            allow_replace_deleted=True,
+        )
+        self._index.set_ef(ef_search)
+
+        self._labels = {}     # id -> int label
+        self._ids = {}        # int label -> id
+        self._next_label = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __contains__(self, row_id):
+        return row_id in self._labels
+
+    def add(self, ids, vectors):
+        with self._lock:
+            vectors = np.asarray(vectors, dtype=np.float32)
+
+            # re-adding an id replaces its vector
+            self._remove([row_id for row_id in ids if row_id in self._labels])
+
+            needed = len(self._labels) + len(ids)
+            capacity = self._index.get_max_elements()
+            if needed > capacity:
+                self._index.resize_index(max(needed, 2 * capacity))
+
+            labels = np.arange(self._next_label, self._next_label + len(ids))
+            self._next_label += len(ids)
+
+            self._index.add_items(vectors, labels, replace_deleted=True)
+            for label, row_id in zip(labels.tolist(), ids):
+                self._labels[row_id] = label
+                self._ids[label] = row_id
+
+    def remove(self, ids):
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids):
+        for row_id in ids:
+            label = self._labels.pop(row_id, None)
+            if label is not None:
+                self._index.mark_deleted(label)
+                del self._ids[label]
+
+    def query(self, vectors, k=1):
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+
+        with self._lock:
+            k = min(k, len(self._labels))
+            if k == 0:
+                return [[] for _ in vectors], np.empty((len(vectors), 0), np.float32)
+
+            self._index.set_ef(max(self.ef_search, k))
+            labels, distances = self._index.knn_query(vectors, k=k)
+            ids = [[self._ids[label] for label in row] for row in labels.tolist()]
+
+        # hnswlib "ip" distance is 1 - dot product
+        return ids, (1.0 - distances).astype(np.float32)
+
+    def save(self, path):
+        with self._lock:
+            self._index.save_index(path)
+            with open(f"{path}.ids.json", "w") as file:
+                json.dump(
+                    {
+                        "dim": self.dim,
+                        "m": self.m,
+                        "ef_construction": self.ef_construction,
+                        "ef_search": self.ef_search,
+                        "next_label": self._next_label,
+                        "labels": self._labels,
+                    },
+                    file,
+                )
+
+    @classmethod
+    def load(cls, path):
+        with open(f"{path}.ids.json") as file:
+            meta = json.load(file)
+
+        index = cls(
+            dim=meta["dim"],
+            m=meta["m"],
+            ef_construction=meta["ef_construction"],
+            ef_search=meta["ef_search"],
+        )
+        raw = hnswlib.Index(space="ip", dim=index.dim)
+        raw.load_index(path, allow_replace_deleted=True)
+        raw.set_ef(index.ef_search)
+        index._index = raw
+        index._labels = meta["labels"]
+        index._ids = {label: row_id for row_id, label in index._labels.items()}
+        index._next_label = meta["next_label"]
+        return index
+
+
+# ---------------- FACTORY ---------------- #
+
+INDEX_TYPES = {
+    BruteForceIndex.kind: BruteForceIndex,
+    HNSWIndex.kind: HNSWIndex,
+}
+
+
+def create_index(kind=DEFAULT_INDEX_KIND, **kwargs):
+    """
+    kind: "brute", "hnsw" or "auto" (HNSW when hnswlib is installed)
+    """
+    if kind == "auto":
+        kind = HNSWIndex.kind if hnswlib is not None else BruteForceIndex.kind
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index: {kind}")
+    return INDEX_TYPES[kind](**kwargs)
+
+
+def load_index(path, kind):
+    return INDEX_TYPES[kind].load(path)
@@ -0,0 +1,293 @@
+"""
+Bulk import of registered cases from a manifest + image directory.
+
+    python import_cases.py cases.csv images/ --submitted-by Admin
+
+The manifest is CSV or JSONL (by extension). Each record needs an
+`image` file name (relative to the image directory) and `name`; any
+other RegisteredCases field (father_name, age, color, height,
+complainant_name, complainant_mobile, adhaar_card, last_seen, address,
+birth_marks, submitted_by) is copied when present.
+
+Progress is written to <manifest>.checkpoint after every batch, so a
+re-run skips records that were already imported or rejected (no face,
+unreadable image); records that failed for other reasons, such as an
+upload error, are retried. Case ids are derived from the import id
+(--import-id, by default a hash of the manifest's content) and the
+record key, so records that were saved but not checkpointed (a crash
+in between) are not inserted twice, while another manifest that
+happens to use the same file and image names still gets its own cases.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from helper import db_queries, embeddings, face_batch, match_algo, renditions
+from helper.data_models import RegisteredCases
+from helper.storage import get_storage
+
+CASE_FIELDS = [
+    "submitted_by",
+    "name",
+    "father_name",
+    "age",
+    "color",
+    "height",
+    "complainant_name",
+    "complainant_mobile",
+    "adhaar_card",
+    "last_seen",
+    "address",
+    "birth_marks",
+]
+
+
+# -------------------------------------
+# MANIFEST + CHECKPOINT
+# -------------------------------------
+
+def read_manifest(path):
+    with open(path, newline="", encoding="utf-8") as file:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            return [json.loads(line) for line in file if line.strip()]
+        return list(csv.DictReader(file))
+
+
+def record_key(record):
+    return str(record.get("id") or record["image"])
+
+
+# fixed: changing it would re-import every manifest
+IMPORT_NAMESPACE = uuid.UUID("5b0f6a52-2d4c-4d38-9a57-3f1c0f6f2b61")
+
+
+def manifest_import_id(manifest):
+    """
+    Default import id: the SHA-256 of the manifest's content.
+    """
+    digest = hashlib.sha256()
+    with open(manifest, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def case_id(import_id, record):
+    """
+    Same import id + record key -> same RegisteredCases.id.
+    """
+    return str(uuid.uuid5(IMPORT_NAMESPACE, f"{import_id}:{record_key(record)}"))
+
+
+def read_checkpoint(path):
+    if not os.path.isfile(path):
+        return set()
+    with open(path, encoding="utf-8") as file:
+        return {line.strip() for line in file if line.strip()}
+
+
+def write_checkpoint(path, keys):
+    with open(path, "a", encoding="utf-8") as file:
+        file.writelines(f"{key}\n" for key in keys)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+# -------------------------------------
+# IMPORT
+# -------------------------------------
+
+def _read_bytes(image_path):
+    try:
+        with open(image_path, "rb") as file:
+            return file.read()
+    except OSError as e:
+        print("Read error:", e)
+        return None
+
+
+def _start_renditions(data, image_url):
+    """
+    Returns:
+        dict of rendition futures; empty when the image can't be decoded,
+        the case then falls back to the original image
+    """
+    try:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        return renditions.upload_renditions_async(
+            image, get_storage().object_name(image_url)
+        )
+    except Exception as e:
+        print(f"Renditions skipped for {image_url}: {e}")
+        return {}
+
+
+def build_case(record, embedding, image_urls, submitted_by, case_id):
+    fields = {field: str(record.get(field) or "") for field in CASE_FIELDS}
+    fields["submitted_by"] = fields["submitted_by"] or submitted_by
+
+    return RegisteredCases(
+        id=case_id,
+        **fields,
+        face_mesh=json.dumps(embedding.astype(float).tolist()),
+        face_embedding=embeddings.to_blob(embedding),
+        **image_urls,
+        status="NF",
+        matched_with="",
+    )
+
+
+def import_batch(records, image_dir, submitted_by, extract_pool, import_id):
+    """
+    Returns:
+        (imported, rejected, failed) - lists of (record, message);
+        rejected records can't be imported as they are, failed ones
+        may succeed on a re-run
+    """
+    ids = [case_id(import_id, record) for record in records]
+
+    # saved by a run that stopped before its checkpoint
+    existing = db_queries.existing_registered_ids(ids)
+    imported = [(record, "Already imported") for record, id_ in zip(records, ids) if id_ in existing]
+    records = [record for record, id_ in zip(records, ids) if id_ not in existing]
+    if not records:
+        return imported, [], []
+
+    storage = get_storage()
+    paths = [os.path.join(image_dir, record["image"]) for record in records]
+    contents = [_read_bytes(path) for path in paths]
+    readable = [i for i, data in enumerate(contents) if data is not None]
+
+    # Uploads are network-bound, extraction is CPU-bound: run both at once
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        upload_future = pool.submit(
+            storage.upload_many,
+            [(contents[i], os.path.basename(paths[i])) for i in readable],
+        )
+        extracted = face_batch.extract_embeddings_batch(paths, executor=extract_pool)
+
+        urls = [None] * len(paths)
+        for i, url in zip(readable, upload_future.result()):
+            urls[i] = url
+
+    accepted, rejected, failed = [], [], []
+    for record, result, url, data in zip(records, extracted, urls, contents):
+        if not result["status"]:
+            if url:
+                storage.delete(url)
+            if data is None or result["message"] == "No face detected":
+                rejected.append((record, result["message"]))
+            else:
+                failed.append((record, result["message"]))
+        elif not url:
+            failed.append((record, "Image upload failed"))
+        else:
+            # renditions of every accepted image upload concurrently
+            accepted.append((record, result, url, _start_renditions(data, url)))
+
+    cases = []
+    for record, result, url, rendition_futures in accepted:
+        image_urls = {"image_path": url, **renditions.collect_renditions(rendition_futures)}
+        embedding = result["faces"][0]["embedding"]
+        cases.append(
+            build_case(record, embedding, image_urls, submitted_by, case_id(import_id, record))
+        )
+        imported.append((record, "OK"))
+
+    if cases:
+        db_queries.register_cases_bulk(cases)
+    return imported, rejected, failed
+
+
+def run_import(manifest, image_dir, submitted_by, batch_size=200,
+               workers=None, run_match=True, import_id=None):
+    import_id = import_id or manifest_import_id(manifest)
+    checkpoint = f"{manifest}.checkpoint"
+    done = read_checkpoint(checkpoint)
+
+    records, seen = [], set()
+    for record in read_manifest(manifest):
+        if not record.get("image") or not record.get("name"):
+            print(f"Skipped manifest record without image/name: {record}")
+        elif record_key(record) in seen:
+            # same key -> same case id
+            print(f"Skipped duplicate manifest record: {record_key(record)}")
+        elif record_key(record) not in done:
+            records.append(record)
+        seen.add(record_key(record))
+    print(f"{len(done)} already imported, {len(records)} to go.")
+
+    total_imported, total_rejected, total_failed = 0, 0, 0
+    started = time.perf_counter()
+
+    extract_pool = face_batch.create_pool(workers)
+    try:
+        for start in range(0, len(records), batch_size):
+            batch = records[start : start + batch_size]
+            imported, rejected, failed = import_batch(
+                batch, image_dir, submitted_by, extract_pool, import_id
+            )
+
+            # Rejected records are checkpointed too; fix them and import them
+            # from a new manifest rather than retrying on every run. Failed
+            # ones are not, so the next run tries them again.
+            write_checkpoint(checkpoint, [record_key(r) for r, _ in imported + rejected])
+
+            for record, message in rejected:
+                print(f"Skipped {record_key(record)}: {message}")
+            for record, message in failed:
+                print(f"Failed {record_key(record)}, retried on the next run: {message}")
+
+            total_imported += len(imported)
+            total_rejected += len(rejected)
+            total_failed += len(failed)
+            print(
+                f"{start + len(batch)}/{len(records)} processed "
+                f"({time.perf_counter() - started:.1f}s)"
+            )
+    finally:
+        extract_pool.shutdown()
+
+    print(
+        f"Imported {total_imported} cases, skipped {total_rejected}, "
+        f"{total_failed} failed (re-run to retry them)."
+    )
+
+    if run_match and total_imported:
+        print(match_algo.match())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("manifest", help="CSV or JSONL manifest")
+    parser.add_argument("image_dir", help="directory holding the images")
+    parser.add_argument("--submitted-by", default="Admin",
+                        help="officer name for records without submitted_by")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="face extraction processes (default: all CPUs)")
+    parser.add_argument("--no-match", action="store_true",
+                        help="skip the match run after importing")
+    parser.add_argument("--import-id", default=None,
+                        help="keeps case ids stable when the manifest is edited "
+                             "between runs (default: hash of the manifest)")
+    args = parser.parse_args()
+
+    run_import(
+        args.manifest,
+        args.image_dir,
+        args.submitted_by,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        run_match=not args.no_match,
+        import_id=args.import_id,
+    )
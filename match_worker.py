@@ -0,0 +1,141 @@
+"""
+Background matching worker.
+
+    python match_worker.py                 # poll every 60 s
+    python match_worker.py --once          # one run, e.g. from cron
+
+Keeps the registered gallery and every face of the public submissions
+in memory, refreshes them from the database on every poll, and only
+scores what was added since the last run: new submissions against every
+registered case, and every submission against new registered cases.
+Removals (resolved cases) need no scoring. Scored pairs go to the
+matchcandidates table for officers to review on the Match Cases page;
+every run is recorded in matchruns.
+Candidates are unique per pair, so restarts and overlapping runs are
+safe.
+"""
+import argparse
+import time
+import traceback
+
+from helper import db_queries, gallery_cache, match_algo
+
+POLL_SECONDS = 60
+
+
+class MatchWorker:
+    def __init__(self, similarity_threshold=match_algo.SIMILARITY_THRESHOLD,
+                 k=match_algo.MATCH_TOP_K):
+        self.similarity_threshold = similarity_threshold
+        self.k = k
+        self.registered_version = None
+        self.public_version = None
+        self.scored_public = set()       # submissions already queried
+        self.scored_registered = set()   # registered cases already swept against
+
+    def run_once(self, force=False):
+        """
+        Returns:
+            dict - run summary, or None when nothing changed
+        """
+        registered = gallery_cache.registered_gallery.refresh()
+        public = gallery_cache.public_faces.refresh()
+
+        # Versions are read before the snapshot that gets scored: a row
+        # added after this point bumps the version again and is picked
+        # up by the next poll.
+        registered_version = registered.version
+        public_version = public.version
+
+        registered_changed = registered_version != self.registered_version
+        public_changed = public_version != self.public_version
+        if not (force or registered_changed or public_changed):
+            return None
+
+        faces = public.face_snapshot()
+        pub_ids = set(faces[1])
+        reg_ids = set(registered.snapshot()[0]) if registered_changed else self.scored_registered
+
+        run_id = db_queries.start_match_run()
+        counts = {
+            "registered_count": len(registered),
+            "public_count": len(pub_ids),
+        }
+        try:
+            counts["superseded_count"] = db_queries.expire_candidates()
+
+            if force or self.registered_version is None:
+                sweeps = [{}]   # everything against everything
+            else:
+                # new registered cases can match any open submission,
+                # new submissions any registered case
+                new_registered = reg_ids - self.scored_registered
+                new_public = pub_ids - self.scored_public
+                sweeps = []
+                if new_registered:
+                    sweeps.append({"registered_ids": new_registered})
+                if new_public:
+                    sweeps.append({"public_ids": new_public})
+
+            counts["scored_count"] = counts["candidate_count"] = 0
+            message = None
+            for sweep in sweeps:
+                # score exactly this snapshot, match() must not refresh again
+                result = match_algo.match(
+                    self.similarity_threshold, self.k, run_id=run_id,
+                    registered=registered, faces=faces, **sweep,
+                )
+                # new submissions are a subset of every submission
+                counts["scored_count"] = max(counts["scored_count"], result.get("scored", 0))
+                counts["candidate_count"] += sum(
+                    len(pubs) for pubs in result.get("result", {}).values()
+                )
+                message = result.get("message") or message
+            db_queries.finish_match_run(run_id, "done", message, **counts)
+        except Exception as e:
+            db_queries.finish_match_run(run_id, "failed", str(e), **counts)
+            raise
+
+        self.registered_version = registered_version
+        self.public_version = public_version
+        self.scored_public = pub_ids
+        self.scored_registered = reg_ids
+
+        counts["run_id"] = run_id
+        return counts
+
+    def run_forever(self, interval=POLL_SECONDS):
+        print(f"Match worker polling every {interval}s.")
+        while True:
+            started = time.perf_counter()
+            try:
+                summary = self.run_once()
+                if summary:
+                    print(
+                        f"Run {summary['run_id']}: {summary['scored_count']} submissions scored, "
+                        f"{summary['candidate_count']} new candidates, "
+                        f"{summary['superseded_count']} superseded "
+                        f"({time.perf_counter() - started:.1f}s)"
+                    )
+            except Exception:
+                # recorded as a failed run when it got that far; retried next poll
+                traceback.print_exc()
+            time.sleep(max(0.0, interval - (time.perf_counter() - started)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--interval", type=float, default=POLL_SECONDS,
+                        help="seconds between polls")
+    parser.add_argument("--once", action="store_true",
+                        help="run once (always matches) and exit")
+    parser.add_argument("--threshold", type=float, default=match_algo.SIMILARITY_THRESHOLD)
+    parser.add_argument("--top-k", type=int, default=match_algo.MATCH_TOP_K,
+                        help="candidates kept per public submission")
+    args = parser.parse_args()
+
+    worker = MatchWorker(args.threshold, args.top_k)
+    if args.once:
+        print(worker.run_once(force=True))
+    else:
+        worker.run_forever(args.interval)
@@ -1,38 +1,492 @@
-from db_connection import execute_query
+"""
+Versioned schema migrations.
+
+    python migrate_db.py
+
+Run once per deploy, before the apps start (run_*.ps1 do this). Applied
+versions are recorded in `schema_version`; every migration is idempotent,
+so a database created by an older create_all() is brought up to date too.
+Add new migrations to the end of MIGRATIONS, never renumber old ones.
+The apps only migrate a brand-new, empty database themselves.
+"""
+import io
+import json
+import os
+import urllib.request
+from contextlib import contextmanager
+from uuid import uuid4
+
+import numpy as np
+from PIL import Image
+from sqlalchemy import inspect, text
+from sqlmodel import SQLModel
+
+from db_connection import engine, execute_query, fetch_one
+from helper import embeddings, renditions
+from helper.data_models import (
+    MatchCandidates,
+    MatchRuns,
+    PublicSubmissions,
+    RegisteredCases,
+    SubmissionFaces,
+)
+from helper.storage import get_storage
 
 # -------------------------------------
-# CREATE TABLES
+# SCHEMA VERSION
 # -------------------------------------
 
-create_missing_persons = """
-CREATE TABLE IF NOT EXISTS missing_persons (
-    id SERIAL PRIMARY KEY,
-    name TEXT,
-    age INTEGER,
-    gender TEXT,
-    location TEXT,
-    description TEXT,
-    image_path TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+create_schema_version = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(128) NOT NULL,
+    applied_on TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 """
 
-create_suspected_persons = """
-CREATE TABLE IF NOT EXISTS suspected_persons (
-    id SERIAL PRIMARY KEY,
-    name TEXT,
-    location TEXT,
-    remarks TEXT,
-    image_path TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-);
-"""
+CASE_TABLES = [RegisteredCases.__table__, PublicSubmissions.__table__]
+
+
+def get_schema_version():
+    if not inspect(engine).has_table("schema_version"):
+        return 0
+    return fetch_one("SELECT MAX(version) FROM schema_version")[0] or 0
+
+
+def is_empty_database():
+    """
+    True when none of the app's tables exist yet.
+    """
+    inspector = inspect(engine)
+    return not any(
+        inspector.has_table(name)
+        for name in ["schema_version", *(table.name for table in CASE_TABLES)]
+    )
+
+
+# -------------------------------------
+# MIGRATION LOCK
+# -------------------------------------
+
+# arbitrary, identifies this app's migrations among Postgres advisory locks
+ADVISORY_LOCK_KEY = 4_240_019
+
+
+@contextmanager
+def migration_lock():
+    """
+    Only one process migrates at a time (e.g. both apps starting on an
+    empty database). Postgres uses a session advisory lock; SQLite locks
+    a file next to the database. Both are released if the process dies.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+        return
+
+    database = engine.url.database
+    if engine.dialect.name != "sqlite" or not database or database == ":memory:":
+        yield
+        return
+
+    with open(f"{database}.migrate.lock", "a+b") as lock_file:
+        _lock_file(lock_file)
+        try:
+            yield
+        finally:
+            _unlock_file(lock_file)
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock_file(file):
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:   # LK_LOCK gives up after ~10 s
+                continue
+
+    def _unlock_file(file):
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+
+    def _unlock_file(file):
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+# -------------------------------------
+# BASELINE TABLES
+# -------------------------------------
+
+def create_tables():
+    """
+    Creates the case tables if they don't exist yet. A fresh database gets
+    the current model definitions, which the later migrations then find
+    already applied.
+    """
+    SQLModel.metadata.create_all(engine, tables=CASE_TABLES)
+
+
+# -------------------------------------
+# BINARY FACE EMBEDDINGS
+# -------------------------------------
+
+EMBEDDING_TABLES = ["registeredcases", "publicsubmissions"]
+
+
+def add_embedding_columns():
+    """
+    Adds the float32 `face_embedding` column next to the JSON `face_mesh`.
+    """
+    blob_type = "BYTEA" if engine.dialect.name == "postgresql" else "BLOB"
+    inspector = inspect(engine)
+
+    for table in EMBEDDING_TABLES:
+        if not inspector.has_table(table):
+            continue
+        columns = [col["name"] for col in inspector.get_columns(table)]
+        if "face_embedding" not in columns:
+            execute_query(f"ALTER TABLE {table} ADD COLUMN face_embedding {blob_type}")
+
+
+def backfill_embeddings(batch_size=500):
+    """
+    Converts existing JSON `face_mesh` rows into `face_embedding` bytes.
+    Safe to re-run: only rows without an embedding are touched.
+    """
+    inspector = inspect(engine)
+
+    for table in EMBEDDING_TABLES:
+        if not inspector.has_table(table):
+            continue
+
+        total = 0
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(
+                    text(
+                        f"SELECT id, face_mesh FROM {table} "
+                        "WHERE face_embedding IS NULL AND face_mesh IS NOT NULL "
+                        "LIMIT :limit"
+                    ),
+                    {"limit": batch_size},
+                ).fetchall()
+
+                if not rows:
+                    break
+
+                params = []
+                for row in rows:
+                    face_mesh = json.loads(row.face_mesh)
+                    # rows saved without a face ("null") get an empty blob
+                    # so they are not picked up again
+                    emb = embeddings.to_blob(face_mesh) if face_mesh else b""
+                    params.append({"id": row.id, "emb": emb})
+
+                conn.execute(
+                    text(f"UPDATE {table} SET face_embedding = :emb WHERE id = :id"),
+                    params,
+                )
+                total += len(params)
+
+        print(f"Backfilled {total} embeddings in {table}.")
+
+
+# -------------------------------------
+# IMAGE RENDITIONS
+# -------------------------------------
+
+RENDITION_COLUMNS = ["thumbnail_path", "medium_path"]
+
+
+def add_rendition_columns():
+    """
+    Adds the thumbnail / medium rendition URLs next to `image_path`.
+    """
+    inspector = inspect(engine)
+
+    for table in EMBEDDING_TABLES:
+        if not inspector.has_table(table):
+            continue
+        columns = [col["name"] for col in inspector.get_columns(table)]
+        for column in RENDITION_COLUMNS:
+            if column not in columns:
+                execute_query(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+
+def _load_image(image_path):
+    if str(image_path).startswith("http"):
+        with urllib.request.urlopen(image_path, timeout=30) as response:
+            data = response.read()
+    else:
+        with open(image_path, "rb") as file:
+            data = file.read()
+    return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+def backfill_renditions(batch_size=100):
+    """
+    Creates renditions for images uploaded before they existed.
+    Safe to re-run: only rows without a thumbnail are touched. Images
+    that can't be read are reported and left for the original fallback.
+    """
+    inspector = inspect(engine)
+    storage = get_storage()
+
+    for table in EMBEDDING_TABLES:
+        if not inspector.has_table(table):
+            continue
+
+        total, failed, last_id = 0, 0, ""
+        while True:
+            with engine.connect() as conn:
+                rows = conn.execute(
+                    text(
+                        f"SELECT id, image_path FROM {table} "
+                        "WHERE thumbnail_path IS NULL AND image_path IS NOT NULL "
+                        "AND id > :last_id ORDER BY id LIMIT :limit"
+                    ),
+                    {"last_id": last_id, "limit": batch_size},
+                ).fetchall()
+
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            params = []
+            for row in rows:
+                try:
+                    image = _load_image(row.image_path)
+                    urls = renditions.create_renditions(
+                        image, storage.object_name(row.image_path)
+                    )
+                except Exception as e:
+                    print(f"Skipped renditions for {table} {row.id}: {e}")
+                    failed += 1
+                    continue
+                params.append({"id": row.id, **urls})
+
+            if params:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text(
+                            f"UPDATE {table} SET thumbnail_path = :thumbnail_path, "
+                            "medium_path = :medium_path WHERE id = :id"
+                        ),
+                        params,
+                    )
+            total += len(params)
+
+        print(f"Backfilled {total} renditions in {table} ({failed} skipped).")
+
+
+# -------------------------------------
+# INDEXES
+# -------------------------------------
+
+def create_indexes():
+    """
+    Creates the composite indexes declared in the models' __table_args__:
+    (submitted_by, status, submitted_on, id) for an officer's cases,
+    (status, submitted_on, id) for status-filtered, newest-first listings
+    and (submitted_on, id) for unfiltered keyset pages.
+    """
+    inspector = inspect(engine)
+
+    for table in CASE_TABLES:
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            # indexes on columns added by a later migration are created there
+            if all(column.name in columns for column in index.columns):
+                index.create(engine, checkfirst=True)
+
+
+def rebuild_changed_indexes():
+    """
+    Recreates the model indexes whose columns changed since they were
+    created (e.g. `id` appended as the keyset tie-break), then creates
+    the missing ones.
+    """
+    inspector = inspect(engine)
+
+    for table in CASE_TABLES:
+        existing = {
+            index["name"]: index["column_names"] for index in inspector.get_indexes(table.name)
+        }
+        for index in table.indexes:
+            columns = [column.name for column in index.columns]
+            if index.name in existing and existing[index.name] != columns:
+                index.drop(engine)
+
+    create_indexes()
+
+
+def add_status_changed_columns():
+    """
+    Adds the indexed `status_changed_on` timestamp that status writes set,
+    so galleries read only recently resolved rows. Rows resolved before
+    it existed stay NULL; galleries never load them anyway.
+    """
+    timestamp_type = "TIMESTAMP" if engine.dialect.name == "postgresql" else "DATETIME"
+    inspector = inspect(engine)
+
+    for table in EMBEDDING_TABLES:
+        if not inspector.has_table(table):
+            continue
+        columns = [col["name"] for col in inspector.get_columns(table)]
+        if "status_changed_on" not in columns:
+            execute_query(f"ALTER TABLE {table} ADD COLUMN status_changed_on {timestamp_type}")
+
+    create_indexes()
+
+
+# -------------------------------------
+# MATCH CANDIDATES
+# -------------------------------------
+
+def create_match_tables():
+    """
+    Candidate pairs and run metadata written by match_worker.py.
+    """
+    SQLModel.metadata.create_all(
+        engine, tables=[MatchCandidates.__table__, MatchRuns.__table__]
+    )
+
+
+# -------------------------------------
+# SUBMISSION FACES
+# -------------------------------------
+
+def create_face_table():
+    """
+    One row per detected face of a public submission.
+    """
+    SQLModel.metadata.create_all(engine, tables=[SubmissionFaces.__table__])
+
+
+def backfill_submission_faces(batch_size=500):
+    """
+    Gives every existing submission a face row from its stored embedding,
+    so the matcher (which only reads submissionfaces) still sees it. Only
+    the one face that was kept is available; there is no box or score.
+    Safe to re-run: submissions that already have faces are skipped.
+    """
+    total, last_id = 0, ""
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT p.id, p.face_embedding, p.face_mesh, p.submitted_on "
+                    "FROM publicsubmissions p WHERE p.id > :last_id AND NOT EXISTS "
+                    "(SELECT 1 FROM submissionfaces f WHERE f.public_case_id = p.id) "
+                    "ORDER BY p.id LIMIT :limit"
+                ),
+                {"last_id": last_id, "limit": batch_size},
+            ).fetchall()
+
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            params = []
+            for row in rows:
+                emb = embeddings.from_row(row.face_embedding, row.face_mesh)
+                # rows saved without a face have nothing to match on
+                if emb is None or emb.shape[0] != embeddings.EMBEDDING_DIM:
+                    continue
+                params.append({
+                    "id": str(uuid4()),
+                    "public_case_id": row.id,
+                    "emb": embeddings.to_blob(emb),
+                    "created_on": row.submitted_on,
+                })
+
+            if params:
+                conn.execute(
+                    text(
+                        "INSERT INTO submissionfaces "
+                        "(id, public_case_id, face_index, face_embedding, created_on) "
+                        "VALUES (:id, :public_case_id, 0, :emb, :created_on)"
+                    ),
+                    params,
+                )
+            total += len(params)
+
+    print(f"Backfilled {total} submission faces.")
+
+
+# -------------------------------------
+# MIGRATION RUNNER
+# -------------------------------------
+
+def migrate_embeddings():
+    add_embedding_columns()
+    backfill_embeddings()
+
+
+def migrate_renditions():
+    add_rendition_columns()
+    backfill_renditions()
+
+
+def migrate_submission_faces():
+    create_face_table()
+    backfill_submission_faces()
+
+
+MIGRATIONS = [
+    (1, "baseline case tables", create_tables),
+    (2, "binary face embeddings", migrate_embeddings),
+    (3, "image renditions", migrate_renditions),
+    (4, "listing indexes", create_indexes),
+    (5, "match candidates", create_match_tables),
+    (6, "submission faces", migrate_submission_faces),
+    (7, "keyset pagination indexes", rebuild_changed_indexes),
+    (8, "status change timestamps", add_status_changed_columns),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
 
 def migrate():
-    execute_query(create_missing_persons)
-    execute_query(create_suspected_persons)
-    print("Tables created successfully.")
+    """
+    Applies every migration newer than the recorded schema version,
+    holding the migration lock.
+
+    Returns:
+        int - schema version after migrating
+    """
+    with migration_lock():
+        execute_query(create_schema_version)
+        # read under the lock: another process may have just migrated
+        current = get_schema_version()
+
+        for version, name, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            print(f"Applying migration {version}: {name}")
+            apply()
+            execute_query(
+                "INSERT INTO schema_version (version, name) VALUES (:version, :name)",
+                {"version": version, "name": name},
+            )
+
+    current = get_schema_version()
+    print(f"Schema is at version {current}.")
+    return current
 
 
 if __name__ == "__main__":
-    migrate()
\ No newline at end of file
+    migrate()
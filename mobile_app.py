@@ -3,13 +3,15 @@ import json
 import numpy as np
 import streamlit as st
 
-from helper import db_queries
+from helper import db_queries, embeddings, gallery_cache, model_cache, upload_cache
 from helper.data_models import PublicSubmissions
-from helper.utils import image_obj_to_numpy, extract_face_embedding
-from helper.supabase_storage import upload_image
+from helper.streamlit_helpers import paginate, show_case_image
 
 st.set_page_config("Mobile UI", initial_sidebar_state="expanded")
 
+model_cache.start_warm_up()
+gallery_cache.start_warm_up()
+
 # -------------------------------
 # SIDEBAR MENU
 # -------------------------------
@@ -27,9 +29,10 @@ menu = st.sidebar.radio(
 if menu == "Registered Cases":
     st.title("Registered Missing Persons (Not Found)")
 
-    cases = db_queries.get_all_cases()
-
-    not_found_cases = [case for case in cases if case.status == "NF"]
+    not_found_cases = paginate(
+        "mobile_registered_page",
+        lambda cursor: db_queries.list_registered_cases(status="NF", after=cursor),
+    )
 
     if not_found_cases:
         for case in not_found_cases:
@@ -37,10 +40,7 @@ if menu == "Registered Cases":
             col1, col2 = st.columns([1, 2])
 
             with col1:
-                if case.image_path and str(case.image_path).startswith("http"):
-                    st.image(case.image_path, width=150)
-                else:
-                    st.warning("Image not available")
+                show_case_image(case, width=150)
 
             with col2:
                 st.write(f"**Name:** {case.name}")
@@ -59,7 +59,10 @@ elif menu == "All Cases":
     st.title("Missing Persons")
     st.subheader("Registered Missing Persons")
 
-    cases = db_queries.get_all_cases()
+    cases = paginate(
+        "mobile_all_cases_page",
+        lambda cursor: db_queries.list_registered_cases(after=cursor),
+    )
 
     if cases:
         for case in cases:
@@ -67,10 +70,7 @@ elif menu == "All Cases":
             col1, col2 = st.columns([1, 2])
 
             with col1:
-                if case.image_path and str(case.image_path).startswith("http"):
-                    st.image(case.image_path, width=150)
-                else:
-                    st.warning("Image not available")
+                show_case_image(case, width=150)
 
             with col2:
                 st.write(f"**Name:** {case.name}")
@@ -104,13 +104,26 @@ elif menu == "Register New Case":
             with st.spinner("Processing..."):
                 st.image(image_obj, width=200)
 
-                image_numpy = image_obj_to_numpy(image_obj)
-                face_mesh = extract_face_embedding(image_numpy)
-
-                file_bytes = image_obj.getvalue()
-                image_path = upload_image(file_bytes, image_obj.name)
+                # Cached by content hash: reruns reuse the embedding and URL
+                processed = upload_cache.process_upload(
+                    image_obj.getvalue(), image_obj.name
+                )
+                image_numpy = processed["image"]
+                face_mesh = processed["embedding"]
+                image_path = processed["image_path"]
+                faces = processed["faces"]
+
+            if not face_mesh:
+                st.error("No face detected. Please upload a clear face image.")
+            elif not image_path:
+                st.error("Image upload failed. Please try again.")
+            elif len(faces) > 1:
+                st.info(
+                    f"{len(faces)} faces found. "
+                    "Each of them will be checked against the missing persons."
+                )
 
-    if image_obj:
+    if image_obj and face_mesh and image_path:
         with form_col.form(key="new_user_submission"):
             name = st.text_input("Your Name")
             mobile_number = st.text_input("Your Mobile Number")
@@ -132,12 +145,17 @@ elif menu == "Register New Case":
                     color=color,
                     height=height,
                     face_mesh=json.dumps(face_mesh),
+                    face_embedding=embeddings.to_blob(face_mesh),
                     image_path=image_path,
+                    thumbnail_path=processed["thumbnail_path"],
+                    medium_path=processed["medium_path"],
                     birth_marks=birth_marks,
                     status="NF",
                 )
 
-                db_queries.new_public_case(public_submission_details)
+                db_queries.new_public_case(
+                    public_submission_details, faces=faces
+                )
                 save_flag = 1
 
         if save_flag == 1:
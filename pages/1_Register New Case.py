@@ -4,9 +4,7 @@ import streamlit as st
 import json
 from helper.data_models import RegisteredCases
 
-from helper import db_queries
-from helper.utils import image_obj_to_numpy, extract_face_embedding
-from helper.supabase_storage import upload_image
+from helper import db_queries, embeddings, upload_cache
 
 st.set_page_config(page_title="Register New Case")
 
@@ -29,6 +27,7 @@ image_numpy = None
 image_path = None
 face_mesh = None
 save_flag = False
+match_result = None
 
 # ---------------- IMAGE UPLOAD ---------------- #
 with image_col:
@@ -42,15 +41,21 @@ with image_col:
         with st.spinner("Processing image..."):
             st.image(image_obj, width=250)
 
-            image_numpy = image_obj_to_numpy(image_obj)
-            face_mesh = extract_face_embedding(image_numpy)
+            # Cached by content hash: reruns reuse the embedding and URL
+            processed = upload_cache.process_upload(image_obj.getvalue(), image_obj.name)
+            image_numpy = processed["image"]
+            face_mesh = processed["embedding"]
+            image_path = processed["image_path"]
 
-            if face_mesh:
-                # Upload image to Supabase
-                file_bytes = image_obj.getvalue()
-                image_path = upload_image(file_bytes, image_obj.name)
+            if face_mesh and image_path:
                 st.success("Image uploaded successfully")
-            else:
+                st.caption(
+                    "Processed in {:.0f} ms (face model {:.0f} ms, upload {:.0f} ms)".format(
+                        *(processed["timings"].get(stage, 0) * 1000
+                          for stage in ("total", "inference", "upload"))
+                    )
+                )
+            elif not face_mesh:
                 st.error("Face not detected. Please upload a clear face image.")
 
 # ---------------- FORM ---------------- #
@@ -91,7 +96,10 @@ with form_col.form(key="new_case_form"):
                 complainant_mobile=mobile_number,
                 complainant_name=complainant_name,
                 face_mesh=json.dumps(face_mesh),
+                face_embedding=embeddings.to_blob(face_mesh),
                 image_path=image_path,  # Supabase public URL
+                thumbnail_path=processed["thumbnail_path"],
+                medium_path=processed["medium_path"],
                 adhaar_card=adhaar_card,
                 birth_marks=birthmarks,
                 address=address,
@@ -100,9 +108,12 @@ with form_col.form(key="new_case_form"):
                 matched_with="",
             )
 
-            db_queries.register_new_case(new_case_details)
+            match_result = db_queries.register_new_case(new_case_details)
             save_flag = True
 
 # ---------------- SUCCESS MESSAGE ---------------- #
 if save_flag:
     st.success("Case registered successfully!")
+
+    if match_result and match_result["result"]:
+        st.info("A possible match was found. Review it on the Match Cases page.")
@@ -1,33 +1,15 @@
+import datetime
+
 import streamlit as st
 from helper import db_queries
-from helper.streamlit_helpers import require_login
+from helper.streamlit_helpers import require_login, show_case_image, show_image_path
 
 
-def show_image(image_col, image_path):
+def case_viewer(case):
     """
-    Unified image loader:
-    - Works for Supabase URLs
-    - Works for local images
+    `case` is a row from db_queries.fetch_registered_cases_with_matches,
+    which already carries the matched submission's details.
     """
-    if image_path:
-        # If Supabase URL
-        if str(image_path).startswith("http"):
-            image_col.image(image_path, width=200)
-        else:
-            try:
-                image_col.image(image_path, width=200)
-            except:
-                image_col.warning("Couldn't load image")
-    else:
-        image_col.warning("Image not available")
-
-
-def case_viewer(case):
-    matched_with_details = None
-
-    if case.matched_with:
-        matched_with_details = db_queries.get_public_case_detail(case.matched_with)
-
     data_col, image_col, matched_with_col = st.columns(3)
 
     status = "Found" if case.status == "F" else "Not Found"
@@ -38,15 +20,14 @@ def case_viewer(case):
     data_col.write(f"Last Seen: {case.last_seen}")
     data_col.write(f"Phone: {case.complainant_mobile}")
 
-    # 🔥 Fixed image loader
-    show_image(image_col, case.image_path)
+    show_case_image(case, width=200, container=image_col)
 
-    if matched_with_details:
-        pub = matched_with_details[0]
-        matched_with_col.write(f"Location: {pub.location}")
-        matched_with_col.write(f"Submitted By: {pub.submitted_by}")
-        matched_with_col.write(f"Mobile: {pub.mobile}")
-        matched_with_col.write(f"Birth Marks: {pub.birth_marks}")
+    if case.matched_id is not None:
+        matched_with_col.write(f"Location: {case.matched_location}")
+        matched_with_col.write(f"Submitted By: {case.matched_submitted_by}")
+        matched_with_col.write(f"Mobile: {case.matched_mobile}")
+        matched_with_col.write(f"Birth Marks: {case.matched_birth_marks}")
+        show_image_path(case.matched_image_path, width=120, container=matched_with_col)
 
     st.write("---")
 
@@ -63,8 +44,7 @@ def public_case_viewer(case):
     data_col.write(f"Submitted on: {case.submitted_on}")
     data_col.write(f"Submitted by: {case.submitted_by}")
 
-    # 🔥 Fixed image loader
-    show_image(image_col, case.image_path)
+    show_case_image(case, width=200, container=image_col)
 
     st.write("---")
 
@@ -81,18 +61,41 @@ elif st.session_state["login_status"]:
     status = status_col.selectbox(
         "Filter", options=["All", "Not Found", "Found", "Public Cases"]
     )
-    date = date_col.date_input("Date")
+    # submitted_on is stored in UTC
+    today = datetime.datetime.utcnow().date()
+    date_range = date_col.date_input(
+        "Date", value=(today - datetime.timedelta(days=7), today)
+    )
+
+    public_status = "All"
+    if status == "Public Cases":
+        public_status = status_col.radio(
+            "Public case status", options=["All", "Not Found", "Found"], horizontal=True
+        )
+
+    # while a range is being picked the widget holds only its first day
+    if isinstance(date_range, (tuple, list)):
+        start_date, end_date = date_range[0], date_range[-1]
+    else:
+        start_date = end_date = date_range
 
     st.write("---")
 
     if status == "Public Cases":
-        cases_data = db_queries.fetch_public_cases(False, status)
+        cases_data = db_queries.fetch_public_cases(
+            False, public_status, start_date, end_date
+        )
         for case in cases_data:
             public_case_viewer(case)
     else:
-        cases_data = db_queries.fetch_registered_cases(user, status)
+        cases_data = db_queries.fetch_registered_cases_with_matches(
+            user, status, start_date, end_date
+        )
         for case in cases_data:
             case_viewer(case)
 
+    if not cases_data:
+        st.info("No cases in this date range.")
+
 else:
     st.write("You don't have access to this page")
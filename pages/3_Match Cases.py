@@ -1,57 +1,65 @@
 import streamlit as st
-from helper import db_queries, match_algo, train_model
-from helper.streamlit_helpers import require_login
-
-
-# ---------------- IMAGE LOADER ----------------
-def show_image(image_path, width=300):
-    """
-    Loads image from:
-    - Supabase URL
-    - Local path (fallback)
-    """
-    if image_path:
-        if str(image_path).startswith("http"):
-            st.image(image_path, width=width)
-        else:
-            try:
-                st.image(image_path, width=width)
-            except:
-                st.warning("Couldn't load image")
-    else:
-        st.warning("Image not available")
-
-
-# ---------------- CASE VIEWER ----------------
-@require_login
-def case_viewer(registered_case_id, public_case_id):
-    try:
-        case_details = db_queries.get_registered_case_detail(registered_case_id)[0]
+from db_connection import unit_of_work
+from helper import db_queries
+from helper.streamlit_helpers import show_image_path
 
-        data_col, image_col = st.columns(2)
 
-        for text, value in zip(
-            ["Name", "Mobile", "Age", "Last Seen", "Birth marks"],
-            case_details[:-1],
-        ):
-            data_col.write(f"{text}: {value}")
-
-        image_path = case_details[-1]
-
-        # Update status
-        db_queries.update_found_status(registered_case_id, public_case_id)
-        st.success(
-            "Status Changed. Next time it will be only visible in confirmed cases"
-        )
+RESOLVE_MESSAGES = {
+    "confirmed": ("success", "Match confirmed. Both cases are now marked as found."),
+    "rejected": ("info", "Marked as not a match."),
+    "superseded": ("warning", "One of these cases was already matched elsewhere."),
+    None: ("warning", "This candidate was already reviewed."),
+}
 
-        # 🔥 FIXED IMAGE LOADING
-        with image_col:
-            show_image(image_path)
 
+def resolve(candidate_id, confirm):
+    """Button callback: runs before the page reruns."""
+    try:
+        status = db_queries.resolve_candidate(candidate_id, confirm, st.session_state.user)
+        st.session_state["match_message"] = RESOLVE_MESSAGES[status]
     except Exception as e:
         import traceback
         traceback.print_exc()
-        st.error(f"Something went wrong: {str(e)}")
+        st.session_state["match_message"] = ("error", f"Something went wrong: {str(e)}")
+
+
+# ---------------- CANDIDATE VIEWER ----------------
+def candidate_viewer(candidate):
+    st.subheader(f"Similarity {candidate.score:.2f}")
+
+    registered_col, public_col = st.columns(2)
+
+    registered_col.write("**Registered case**")
+    for text, value in zip(
+        ["Name", "Mobile", "Age", "Last Seen", "Birth marks"],
+        [candidate.name, candidate.complainant_mobile, candidate.age,
+         candidate.last_seen, candidate.birth_marks],
+    ):
+        registered_col.write(f"{text}: {value}")
+    show_image_path(candidate.image_path, width=300, container=registered_col)
+
+    public_col.write("**Public submission**")
+    for text, value in zip(
+        ["Location", "Submitted By", "Mobile", "Birth marks"],
+        [candidate.location, candidate.public_submitted_by,
+         candidate.public_mobile, candidate.public_birth_marks],
+    ):
+        public_col.write(f"{text}: {value}")
+    show_image_path(candidate.public_image_path, width=300, container=public_col)
+
+    confirm_col, reject_col, _ = st.columns([1, 1, 2])
+    confirm_col.button(
+        "Confirm match",
+        key=f"confirm_{candidate.candidate_id}",
+        on_click=resolve,
+        args=(candidate.candidate_id, True),
+    )
+    reject_col.button(
+        "Not a match",
+        key=f"reject_{candidate.candidate_id}",
+        on_click=resolve,
+        args=(candidate.candidate_id, False),
+    )
 
 
 # ---------------- MAIN PAGE ----------------
@@ -64,24 +72,33 @@ elif st.session_state["login_status"]:
     st.title("Check for match")
 
     col1, col2 = st.columns(2)
-    refresh_bt = col1.button("Refresh")
+    col1.button("Refresh")   # reruns the page: re-reads the candidates
+
+    # Matching itself runs in match_worker.py; this page only reads its results
+    with unit_of_work():
+        last_run = db_queries.get_last_match_run()
+        candidates = db_queries.fetch_pending_candidates(user)
+
+    if last_run:
+        col2.caption(
+            f"Last matching run: {last_run.finished_on:%Y-%m-%d %H:%M} UTC ({last_run.status})"
+        )
+    else:
+        col2.caption("The matching worker has not run yet.")
+
+    message = st.session_state.pop("match_message", None)
+    if message:
+        kind, text = message
+        getattr(st, kind)(text)
 
     st.write("---")
 
-    if refresh_bt:
-        with st.spinner("Fetching Data and Training Model..."):
-            train_model.train(user)
-            matched_ids = match_algo.match()
-
-            if matched_ids["status"]:
-                if not matched_ids["result"]:
-                    st.info("No match found")
-                else:
-                    for matched_id, submitted_case_id in matched_ids["result"].items():
-                        case_viewer(matched_id, submitted_case_id[0])
-                        st.write("---")
-            else:
-                st.info("No match found")
+    if not candidates:
+        st.info("No match found")
+
+    for candidate in candidates:
+        candidate_viewer(candidate)
+        st.write("---")
 
 else:
     st.write("You don't have access to this page")
@@ -1 +1,2 @@
+.\fmp\fmp\python.exe .\migrate_db.py
 .\fmp\fmp\python.exe -m streamlit run .\Home.py
\ No newline at end of file
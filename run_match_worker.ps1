@@ -0,0 +1,2 @@
+.\fmp\fmp\python.exe .\migrate_db.py
+.\fmp\fmp\python.exe .\match_worker.py
\ No newline at end of file